@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+#
+# Time the hot paths of the library, optionally saving the results or
+# comparing them against previously saved results
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+import commands as cmd
+import emulator
+import preview
+import structures
+import tracelog
+from connection import connect
+
+STATUS = bytes.fromhex('3801fc80ff0200320001ff00000300ff83')
+
+
+def bench_packets():
+    buf = bytearray(6)
+    rgb = structures.RGB(1, 2, 3)
+    return {
+        'commands.frame': lambda: cmd.frame(cmd.CMD_COLOR, b'\x01\x02'),
+        'commands.frame_into':
+            lambda: cmd.frame_into(buf, 0, cmd.CMD_COLOR, b'\x01\x02'),
+        'commands.brightness': lambda: cmd.brightness(0x80),
+        'commands.color': lambda: cmd.color(rgb),
+        'commands.dot_count': lambda: cmd.dot_count(300),
+    }
+
+
+def bench_structures():
+    pixels = structures.PixelBuffer(300)
+    return {
+        'structures.RGB': lambda: structures.RGB(1, 2, 3),
+        'structures.PixelBuffer.fill': lambda: pixels.fill(b'\x01\x02\x03'),
+        'structures.DeviceStatus': lambda: structures.DeviceStatus.from_bytes(
+            STATUS
+        ),
+    }
+
+
+def timed(func, number):
+    """Return the best time per call of func over a few runs"""
+    timer = timeit.Timer(func)
+    return min(timer.repeat(3, number)) / number
+
+
+def bench_trace(number):
+    """Return the time per frame dumped or written to a trace file"""
+    frame = bytes(range(225)) * 4
+    with tempfile.TemporaryDirectory() as tmp:
+        log = tracelog.TraceLog(
+            os.path.join(tmp, 'trace.bin'), max_bytes=1 << 24, backups=0
+        )
+        try:
+            return {
+                'tracelog.hexdump/900':
+                    timed(lambda: tracelog.hexdump(frame), number),
+                'tracelog.TraceLog/900':
+                    timed(lambda: log.write(0.0, tracelog.TX, frame), number),
+            }
+        finally:
+            log.close()
+
+
+def bench_frames():
+    tests = {}
+    buf = bytearray(preview.FRAME_SIZE)
+    for dotcount in (10, 100, 256, 300):
+        pixels = bytes(range(256)) * 4
+        pixels = pixels[:dotcount * 3]
+        tests['preview.build_frame/{}'.format(dotcount)] = (
+            lambda p=pixels, d=dotcount: preview.build_frame(p, d, buf=buf)
+        )
+    return tests
+
+
+def bench_streaming(frames=200, latency=0.002):
+    """Return the time per frame streaming to the emulator"""
+    results = {}
+    for window in (1, 4):
+        with emulator.Emulator(latency=latency) as device:
+            sock = connect(*device.server_address, timeout=1)
+            stream = preview.PreviewStream(sock, window, keepalive=0)
+            stream.start()
+            frame = bytes(preview.FRAME_SIZE)
+
+            start = time.perf_counter()
+            for i in range(frames):
+                stream.send(frame, block=True)
+            stream.flush()
+            elapsed = time.perf_counter() - start
+            sock.close()
+
+        results['stream/window={}'.format(window)] = elapsed / frames
+    return results
+
+
+def run(number):
+    """Return a dict of seconds per operation for each benchmark"""
+    results = {}
+    for tests in (
+        bench_packets(),
+        bench_structures(),
+        bench_frames(),
+    ):
+        for name, func in tests.items():
+            results[name] = timed(func, number)
+    results.update(bench_trace(number))
+    results.update(bench_streaming())
+    return results
+
+
+def compare(results, saved, threshold):
+    """Print the change from the saved results, return the regressions"""
+    regressions = []
+    for name, value in results.items():
+        if name not in saved:
+            print("{:40} {:10.3f}us (new)".format(name, value * 1e6))
+            continue
+        ratio = value / saved[name]
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = ' REGRESSION'
+            regressions.append(name)
+        print("{:40} {:10.3f}us {:+6.1f}%{}".format(
+            name, value * 1e6, (ratio - 1) * 100, flag
+        ))
+    return regressions
+
+
+def do_options():
+    a = argparse.ArgumentParser('Benchmark the SP108E library')
+    a.add_argument('-n', '--number', action='store', type=int, default=10000)
+    a.add_argument('--save', action='store', default=None,
+                   help='Write the results to this JSON file')
+    a.add_argument('--compare', action='store', default=None,
+                   help='Compare with results saved in this JSON file')
+    a.add_argument('--threshold', action='store', type=float, default=0.2,
+                   help='Slowdown fraction counted as a regression')
+    return a.parse_args()
+
+
+def main(args):
+    results = run(args.number)
+
+    if args.compare and not os.path.exists(args.compare):
+        print("No saved results in {}, not comparing (see make bench.save)"
+              .format(args.compare))
+        args.compare = None
+
+    if args.compare:
+        with open(args.compare) as f:
+            saved = json.load(f)
+        regressions = compare(results, saved, args.threshold)
+    else:
+        regressions = []
+        for name, value in results.items():
+            print("{:40} {:10.3f}us".format(name, value * 1e6))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    args = do_options()
+    main(args)
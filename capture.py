@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+#
+# Grab part of the screen, or a series of image files, and stream it to
+# the LEDs.  This is the python version of x11-to-led.c
+
+import argparse
+import collections
+import itertools
+import time
+
+import color
+import connection
+import layout
+import preview
+import record
+import scheduler
+
+Image = collections.namedtuple('Image', [
+    'data',
+    'width',
+    'height',
+    'bytes_per_line',
+    'bytes_per_pixel',
+    'red_mask',
+    'green_mask',
+    'blue_mask',
+    'byte_order',       # of the pixel values, 'little' or 'big'
+])
+
+
+def channel_offsets(image):
+    """Return the byte offset within each pixel of the R, G and B values"""
+    offsets = []
+    for mask in (image.red_mask, image.green_mask, image.blue_mask):
+        shift = (mask & -mask).bit_length() - 1
+        if shift % 8 or mask >> shift != 0xff:
+            raise ValueError('color mask {:#x} is not one byte'.format(mask))
+        offset = shift // 8
+        if image.byte_order == 'big':
+            offset = image.bytes_per_pixel - 1 - offset
+        offsets.append(offset)
+    return offsets
+
+
+def to_rgb(image):
+    """Convert an image into packed RGB pixels
+
+    Each channel is moved with a single extended slice, using the offsets
+    found from the image masks.
+    """
+    bpp = image.bytes_per_pixel
+    data = memoryview(image.data).cast('B')
+    row = image.width * bpp
+    if image.bytes_per_line != row:
+        # remove the padding at the end of each line
+        data = b''.join(
+            data[y * image.bytes_per_line:y * image.bytes_per_line + row]
+            for y in range(image.height)
+        )
+
+    rgb = bytearray(image.width * image.height * 3)
+    for channel, offset in enumerate(channel_offsets(image)):
+        rgb[channel::3] = data[offset::bpp]
+    return rgb
+
+
+def read_ppm(path):
+    """Load a binary (P6) PPM file with 8 bit samples"""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    # The header is four whitespace separated fields, which may have
+    # comments between them
+    fields = []
+    pos = 0
+    while len(fields) < 4 and pos < len(data):
+        if data[pos:pos+1].isspace():
+            pos += 1
+            continue
+        if data[pos:pos+1] == b'#':
+            pos = data.find(b'\n', pos)
+            if pos < 0:
+                break
+            continue
+        end = pos
+        while end < len(data) and not data[end:end+1].isspace():
+            end += 1
+        fields.append(data[pos:end])
+        pos = end
+    pos += 1
+
+    if (
+        len(fields) < 4 or fields[0] != b'P6' or fields[3] != b'255' or
+        not fields[1].isdigit() or not fields[2].isdigit()
+    ):
+        raise ValueError('{} is not an 8 bit binary PPM'.format(path))
+    width = int(fields[1])
+    height = int(fields[2])
+    if len(data) < pos + width * height * 3:
+        raise ValueError('{} is truncated'.format(path))
+
+    return Image(
+        data[pos:pos + width * height * 3], width, height, width * 3, 3,
+        0xff0000, 0x00ff00, 0x0000ff, 'big',
+    )
+
+
+class FileSource(object):
+    """Frames from a list of PPM files, repeating forever"""
+
+    def __init__(self, paths):
+        self.images = [read_ppm(path) for path in paths]
+        self._next = itertools.cycle(self.images)
+
+    def grab(self):
+        return next(self._next)
+
+
+class X11Source(object):
+    """Frames grabbed from an area of the X11 root window
+
+    This uses python-xlib, which has no XShm support, so each grab is an
+    ordinary GetImage request.
+    """
+
+    def __init__(self, x, y, width, height, display=None):
+        from Xlib import X, display as xdisplay
+
+        self.display = xdisplay.Display(display)
+        screen = self.display.screen()
+        self.root = screen.root
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.zpixmap = X.ZPixmap
+
+        visuals = [
+            visual
+            for depth in screen.allowed_depths
+            for visual in depth.visuals
+            if visual.visual_id == screen.root_visual
+        ]
+        formats = [
+            fmt
+            for fmt in self.display.display.info.pixmap_formats
+            if fmt.depth == screen.root_depth
+        ]
+        if not visuals or not formats:
+            self.display.close()
+            raise ValueError(
+                'no visual or pixmap format for the root window depth {}'
+                .format(screen.root_depth)
+            )
+        self.visual = visuals[0]
+        self.bytes_per_pixel = formats[0].bits_per_pixel // 8
+        pad = formats[0].scanline_pad // 8
+        row = self.width * self.bytes_per_pixel
+        self.bytes_per_line = (row + pad - 1) // pad * pad
+
+        if self.display.display.info.image_byte_order == X.LSBFirst:
+            self.byte_order = 'little'
+        else:
+            self.byte_order = 'big'
+
+    def grab(self):
+        reply = self.root.get_image(
+            self.x, self.y, self.width, self.height, self.zpixmap, 0xffffffff
+        )
+        return Image(
+            reply.data, self.width, self.height,
+            self.bytes_per_line, self.bytes_per_pixel,
+            self.visual.red_mask, self.visual.green_mask,
+            self.visual.blue_mask, self.byte_order,
+        )
+
+
+class Pipeline(object):
+    """Turn images from a source into preview frames"""
+
+    def __init__(self, source, mapping, correction=None):
+        self.source = source
+        self.mapping = mapping
+        self.correction = correction
+        self.buf = bytearray(preview.FRAME_SIZE)
+
+    def frame(self):
+        pixels = self.mapping.gather(to_rgb(self.source.grab()))
+        if self.correction is not None:
+            pixels = self.correction.apply(pixels)
+        return preview.build_frame(pixels, len(self.mapping), buf=self.buf)
+
+
+def do_options():
+    a = argparse.ArgumentParser('Stream a screen area to a SP108E')
+    a.add_argument('-H', '--host', action='store', default='192.168.4.1')
+    a.add_argument('-p', '--port', action='store', default='8189')
+    a.add_argument('--mss', action='store', type=int, default=None,
+                   help='Clamp the TCP MSS down to this')
+    a.add_argument('--geometry', action='store', default='16x16+0+0',
+                   help='Screen area to grab, as WxH+X+Y')
+    a.add_argument('--fps', action='store', type=float, default=None)
+    a.add_argument('--window', action='store', type=int, default=2)
+    a.add_argument('--no-serpentine', dest='serpentine',
+                   action='store_false', default=True)
+    a.add_argument('--rotate', action='store', type=int, default=0)
+    # The defaults match the wiring used by x11-to-led.c
+    a.add_argument('--no-mirror', dest='mirror',
+                   action='store_false', default=True)
+    a.add_argument('--gamma', action='store', type=float, default=1.0)
+    a.add_argument('--brightness', action='store', type=int, default=255)
+    a.add_argument('--order', action='store', default='RGB',
+                   help='Channel order the LEDs expect, e.g. GRB')
+    a.add_argument('--record', action='store', default=None,
+                   help='Save the frames sent, for record.py to replay')
+    a.add_argument('--layout', action='store', default=None,
+                   help='File listing the source pixel index for each LED')
+    a.add_argument('files', nargs='*',
+                   help='PPM files to show instead of grabbing the screen')
+    return a.parse_args()
+
+
+def main(args):
+    size, x, y = args.geometry.split('+')
+    width, height = [int(n) for n in size.split('x')]
+
+    if args.files:
+        source = FileSource(args.files)
+        width = source.images[0].width
+        height = source.images[0].height
+    else:
+        source = X11Source(int(x), int(y), width, height)
+
+    if args.layout:
+        mapping = layout.read_indices(args.layout)
+    else:
+        mapping = layout.grid(
+            width, height,
+            serpentine=args.serpentine,
+            rotation=args.rotate,
+            mirror=args.mirror,
+        )
+    correction = None
+    if args.gamma != 1.0 or args.brightness != 255 or args.order != 'RGB':
+        correction = color.ColorPipeline(
+            args.gamma, args.brightness, args.order
+        )
+    pipeline = Pipeline(source, mapping, correction)
+
+    print("Connecting to {}:{}".format(args.host, int(args.port, 0)))
+    sock = connection.connect(args.host, int(args.port, 0), mss=args.mss)
+    recorder = None
+    if args.record:
+        recorder = record.Recorder(args.record)
+    stream = preview.PreviewStream(
+        sock, args.window,
+        segment=preview.frame_segment(sock),
+        recorder=recorder,
+    )
+    stream.start()
+
+    pacer = None
+    if args.fps:
+        pacer = scheduler.FrameScheduler(args.fps)
+
+    time_last = time.monotonic()
+    frames = 0
+    try:
+        while True:
+            if pacer is not None:
+                pacer.wait()
+            if stream.send(pipeline.frame()):
+                frames += 1
+
+            time_now = time.monotonic()
+            if time_now - time_last >= 1:
+                print("FPS: {:.1f}".format(frames / (time_now - time_last)))
+                time_last = time_now
+                frames = 0
+    finally:
+        if recorder is not None:
+            recorder.close()
+
+
+if __name__ == '__main__':
+    args = do_options()
+    main(args)
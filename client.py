@@ -0,0 +1,152 @@
+"""An asyncio client, so one event loop can drive many controllers"""
+
+import asyncio
+import time
+
+import commands as cmd
+import structures
+
+
+class SP108EClient(object):
+    """A connection to one controller
+
+    After a reply times out, the connection is closed and reopened on the
+    next transaction, so that a late reply cannot be taken as the answer
+    to a later request.
+    """
+
+    def __init__(self, host, port=8189, timeout=2.0, metrics=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.metrics = metrics
+        self.reader = None
+        self.writer = None
+
+        # replies are not tagged, so only one transaction at a time
+        self.lock = asyncio.Lock()
+
+    def __str__(self):
+        fqname = self.__class__.__name__
+        return "{}({}:{})".format(fqname, self.host, self.port)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port),
+            self.timeout
+        )
+
+    async def close(self):
+        if self.writer is None:
+            return
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+        self.reader = None
+        self.writer = None
+
+    async def txn(self, sendbytes):
+        """ Perform a tx transaction """
+        if self.writer is None:
+            await self.connect()
+        self.writer.write(sendbytes)
+        await self.writer.drain()
+        if self.metrics is not None:
+            self.metrics.count('bytes_sent', len(sendbytes))
+
+    async def rxn(self):
+        """ Listen for a reply packet """
+        try:
+            recvbytes = await asyncio.wait_for(
+                self.reader.read(4096),
+                self.timeout
+            )
+        except asyncio.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.count('timeouts')
+            await self.close()
+            raise
+        if not recvbytes:
+            raise ConnectionError("{} closed the connection".format(self))
+        return recvbytes
+
+    async def txn_sync(self, sendbytes):
+        """ Perform a synchronous tx/rx transaction """
+        async with self.lock:
+            if self.metrics is None:
+                await self.txn(sendbytes)
+                return await self.rxn()
+
+            start = time.perf_counter()
+            await self.txn(sendbytes)
+            recvbytes = await self.rxn()
+            self.metrics.observe(sendbytes[4], time.perf_counter() - start)
+            return recvbytes
+
+    async def command(self, packet):
+        """Send a command packet, returning the reply if it has one"""
+        cmdnr = packet[4]
+        if cmdnr not in cmd.response or cmd.response[cmdnr]:
+            return await self.txn_sync(packet)
+
+        async with self.lock:
+            await self.txn(packet)
+        return None
+
+    async def check_device(self, challenge=None):
+        """Send a check packet, and confirm the result is sane"""
+        if challenge is None:
+            challenge = 0x73a52b  # chosen by a fair dice roll
+
+        r = await self.txn_sync(cmd.check_device(challenge))
+        if r != cmd.check_device_reply(challenge):
+            raise ValueError(
+                "{} bad check_device reply {}".format(self, r.hex())
+            )
+        return r[5]
+
+    async def batch(self, *packets):
+        """Send several no-response packets in one write, then resync"""
+        for packet in packets:
+            if cmd.response.get(packet[4], True):
+                raise ValueError(
+                    "cannot batch packet {}".format(bytes(packet).hex())
+                )
+
+        async with self.lock:
+            await self.txn(b''.join(packets))
+        await self.check_device()
+
+    async def sync(self):
+        """Request the device status"""
+        return structures.DeviceStatus.from_bytes(
+            await self.txn_sync(cmd.sync())
+        )
+
+    async def get_device_name(self):
+        """Request the device name"""
+        name = await self.txn_sync(cmd.get_device_name())
+        # The first byte is a NUL
+        return name.lstrip(b'\x00').decode('utf8')
+
+
+async def each(clients, method, *args):
+    """Call the same method on every client concurrently
+
+    The results are returned in the same order as the clients, with any
+    exception returned in place of the result so that one unreachable
+    controller does not stop the others.
+    """
+    return await asyncio.gather(
+        *[getattr(client, method)(*args) for client in clients],
+        return_exceptions=True
+    )
@@ -0,0 +1,54 @@
+"""Color correction of whole frames of packed RGB pixels"""
+
+# The pixel orders selected by CMD_SET_RGB_SEQ 0 - 5 (see notes.txt), and
+# reported as DeviceStatus.rgb_order.  The names follow the usual
+# permutation order; as a check, the status captured in notes.txt reports
+# 2, which is GRB, the native order of the common WS2812 LEDs.
+RGB_ORDERS = ('RGB', 'RBG', 'GRB', 'GBR', 'BRG', 'BGR')
+
+
+def lut(gamma=1.0, brightness=255):
+    """Return a 256 entry translate table for gamma and brightness"""
+    return bytes(
+        round((i / 255) ** gamma * brightness)
+        for i in range(256)
+    )
+
+
+class ColorPipeline(object):
+    """Gamma, brightness and channel order correction
+
+    The tables are built once, so correcting a frame is one bytes.translate
+    per channel, each writing its result straight to the reordered output
+    channel with an extended slice.
+    """
+
+    def __init__(self, gamma=1.0, brightness=255, order='RGB'):
+        if isinstance(gamma, (int, float)):
+            gamma = (gamma,) * 3
+        if isinstance(order, int):
+            if not 0 <= order < len(RGB_ORDERS):
+                raise ValueError(
+                    'order must be 0 - {}'.format(len(RGB_ORDERS) - 1)
+                )
+            order = RGB_ORDERS[order]
+        if sorted(order) != ['B', 'G', 'R']:
+            raise ValueError('order must be a permutation of RGB')
+        if not 0 <= brightness <= 255:
+            raise ValueError('brightness must be 0 - 255')
+
+        self.order = order
+        self.tables = [lut(g, brightness) for g in gamma]
+
+        # For each output channel, which input channel it comes from
+        self.sources = ['RGB'.index(channel) for channel in order]
+
+    def apply(self, rgb, out=None):
+        """Return the corrected copy of the packed RGB pixels"""
+        if not isinstance(rgb, (bytes, bytearray)):
+            rgb = bytes(rgb)
+        if out is None:
+            out = bytearray(len(rgb))
+        for channel, source in enumerate(self.sources):
+            out[channel::3] = rgb[source::3].translate(self.tables[source])
+        return out
@@ -40,6 +40,7 @@ response = {
     CMD_MODE_CHANGE: False,
     CMD_SEC_COUNT: False,
     CMD_SET_IC_MODEL: False,
+    CMD_SET_RGB_SEQ: False,
     CMD_SPEED: False,
     CMD_SYNC: True,
 }
@@ -61,6 +62,19 @@ MODE_CUSTOM_EFFECT = 219
 # Auto sequence through all the multi-color modes
 MODE_AUTO = 0xfc
 
+mode_names = {
+    MODE_METEOR: 'meteor',
+    MODE_BREATHING: 'breathing',
+    MODE_STACK: 'stack',
+    MODE_FLOW: 'flow',
+    MODE_WAVE: 'wave',
+    MODE_FLASH: 'flash',
+    MODE_STATIC: 'static',
+    MODE_CATCHUP: 'catch-up',
+    MODE_CUSTOM_EFFECT: 'custom_effect',
+    MODE_AUTO: 'auto',
+}
+
 # TODO
 #IC_MODEL_xxx = yyy # noqa
 
@@ -69,22 +83,65 @@ def frame(cmd, data):
     """Return the bytes needed for this command packet"""
     if data is None:
         data = b'\x00\x00\x00'
-    elif len(data) < 3:
-        data += bytes(3-len(data))
     elif len(data) > 3:
         raise ValueError("data length max is 3")
+    else:
+        data = bytes(data).ljust(3, b'\x00')
 
     return bytes([CMD_FRAME_START]) + data + bytes([cmd, CMD_FRAME_END])
 
 
+_padding = (b'\x00\x00\x00', b'\x00\x00', b'\x00', b'')
+
+
+def frame_into(buf, offset, cmd, data):
+    """Write the bytes for this command packet into buf at offset
+
+    This avoids creating any new objects, for callers that reuse a buffer
+    for a stream of commands.  Returns the offset after the packet.
+    """
+    if data is None:
+        data = b''
+    elif len(data) > 3:
+        raise ValueError("data length max is 3")
+
+    end = offset + 1 + len(data)
+    buf[offset] = CMD_FRAME_START
+    buf[offset+1:end] = data
+    buf[end:offset+4] = _padding[len(data)]
+    buf[offset+4] = cmd
+    buf[offset+5] = CMD_FRAME_END
+    return offset + 6
+
+
+# Precomputed packets for the commands with no parameters
+_packets0 = {
+    cmd: frame(cmd, None)
+    for cmd in (CMD_GET_DEVICE_NAME, CMD_MODE_AUTO, CMD_SYNC)
+}
+
+# Precomputed packets for every value of the single byte parameter commands
+_packets1 = {
+    cmd: tuple(frame(cmd, bytes([value])) for value in range(256))
+    for cmd in (CMD_BRIGHTNESS, CMD_MODE_CHANGE, CMD_SET_IC_MODEL, CMD_SPEED)
+}
+
+
 def _call0(cmd):
     """Generic command packet with no parameters"""
-    return frame(cmd, None)
+    packet = _packets0.get(cmd)
+    if packet is None:
+        packet = frame(cmd, None)
+    return packet
 
 
 def _call1(cmd, param1):
     """Generic command packet with one parameter"""
-    return frame(cmd, bytes([param1]))
+    table = _packets1.get(cmd)
+    if table is None or not 0 <= param1 <= 255:
+        # Let frame() handle, or complain about, anything unusual
+        return frame(cmd, bytes([param1]))
+    return table[param1]
 
 
 def speed(speed):
@@ -102,6 +159,15 @@ def check_device(challenge):
     return frame(CMD_CHECK_DEVICE, challenge.to_bytes(3, 'little'))
 
 
+def check_device_reply(challenge):
+    """Return the reply expected from a check_device(challenge)"""
+    return b'\x01\x02\x03\x04\x05' + bytes([
+        challenge & 0x53 |
+        (challenge & 0x3f00) >> 6 |
+        (challenge & 0xe00000) >> 21
+    ])
+
+
 def mode_change(mode):
     """Request a display pattern mode change"""
     # I dont know why they didnt let you simply MODE_CHANGE to MODE_AUTO
@@ -127,6 +193,11 @@ def set_ic_model(model):
     return _call1(CMD_SET_IC_MODEL, model)
 
 
+def rgb_seq(order):
+    """Set the order the pixel colors are sent to the LEDs, 0 - 5"""
+    return _call1(CMD_SET_RGB_SEQ, order)
+
+
 def color(rgb):
     """Set the color to be used for the single-color patterns"""
     return frame(CMD_COLOR, rgb.bytes)
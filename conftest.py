@@ -0,0 +1,31 @@
+import socket
+
+import pytest
+
+
+class FakeClock(object):
+    """A clock that only moves when told to, or when something sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.slept.append(round(delay, 6))
+        self.now += delay
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def socks():
+    a, b = socket.socketpair()
+    yield a, b
+    a.close()
+    b.close()
@@ -0,0 +1,107 @@
+"""Simple blocking transactions with the controller over a socket"""
+
+import socket
+
+import commands as cmd
+import tracelog
+
+
+def connect(host, port=8189, timeout=None, mss=None):
+    """Connect to the controller, optionally clamping the TCP MSS
+
+    TCP_MAXSEG can only lower the MSS, never raise it above the one the
+    controller advertises.  That MSS splits preview frames, which corrupts
+    them (see notes.txt), and the route MTU workaround described there
+    may still be needed.  A lower mss only makes preview.frame_segment()
+    choose smaller pieces.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if mss is not None:
+            # Must be set before connecting for it to be negotiated
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_MAXSEG, mss)
+        sock.connect((host, port))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def txn(sock, sendbytes):
+    """ Perform a tx transaction """
+    if tracelog.sinks:
+        tracelog.emit(tracelog.TX, sendbytes)
+
+    sock.sendall(sendbytes)
+
+
+def rxn(sock):
+    """ Listen for a reply packet """
+    recvbytes = sock.recv(4096)
+
+    if tracelog.sinks:
+        tracelog.emit(tracelog.RX, recvbytes)
+
+    return recvbytes
+
+
+def txn_sync(sock, sendbytes):
+    """ Perform a synchronous tx/rx transaction """
+
+    txn(sock, sendbytes)
+    return rxn(sock)
+
+
+def txn_sync_expect(sock, sendbytes, expectbytes):
+    """ Perform a txn_sync() and confirm the result is as expected """
+    r = txn_sync(sock, sendbytes)
+    assert r == expectbytes
+    return r
+
+
+def cmd_check_device(sock, challenge):
+    """Send a check packet, and confirm the result is sane"""
+    if challenge is None:
+        challenge = 0x73a52b  # chosen by a fair dice roll
+
+    r = txn_sync(sock, cmd.check_device(challenge))
+
+    assert r == cmd.check_device_reply(challenge)
+
+    return r[5]
+
+
+class Batch(object):
+    """Collect several command packets to be sent in one write
+
+    Only commands known to have no response can be batched, since there is
+    no way to tell their replies apart.  A single check_device follows the
+    batch, both to keep in sync and to confirm the batch was received.
+    """
+
+    def __init__(self, *packets):
+        self.buf = bytearray()
+        for packet in packets:
+            self.add(packet)
+
+    def __len__(self):
+        return len(self.buf) // 6
+
+    def add(self, packet):
+        """Append a command packet to the batch"""
+        if len(packet) != 6 or cmd.response.get(packet[4], True):
+            raise ValueError(
+                "cannot batch packet {}".format(bytes(packet).hex())
+            )
+        self.buf += packet
+        return self
+
+    def send(self, sock, challenge=None):
+        """Send all the collected packets and resync"""
+        if not self.buf:
+            return
+        txn(sock, bytes(self.buf))
+        self.buf.clear()
+        cmd_check_device(sock, challenge)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+#
+# Find the SP108E controllers on a network, by concurrently trying to
+# connect to every address and checking anything that answers
+
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import random
+import time
+
+from client import SP108EClient
+
+
+async def probe(host, port=8189, timeout=0.5):
+    """Return the device name if host is a controller, otherwise None"""
+    client = SP108EClient(host, port, timeout)
+    try:
+        await client.connect()
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+    try:
+        await client.check_device(random.randrange(0x1000000))
+        return await client.get_device_name()
+    except (OSError, asyncio.TimeoutError, ValueError):
+        return None
+    finally:
+        await client.close()
+
+
+async def scan(network, port=8189, timeout=0.5, limit=256):
+    """Probe every host in the network, at most limit at a time
+
+    Returns a dict of the device name for each controller found.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def one(host):
+        async with semaphore:
+            return host, await probe(host, port, timeout)
+
+    hosts = ipaddress.ip_network(network, strict=False).hosts()
+    results = await asyncio.gather(*[one(str(host)) for host in hosts])
+    return {host: name for host, name in results if name is not None}
+
+
+class Cache(object):
+    """Scan results kept in a JSON file, trusted for ttl seconds"""
+
+    def __init__(self, path, ttl=300, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key):
+        entry = self._load().get(key)
+        if entry is None or self.clock() - entry['time'] > self.ttl:
+            return None
+        return entry['found']
+
+    def put(self, key, found):
+        entries = self._load()
+        entries[key] = {'time': self.clock(), 'found': found}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(entries, f, indent=4, sort_keys=True)
+
+
+def discover(network, port=8189, timeout=0.5, cache=None, refresh=False):
+    """Return the controllers on the network, using the cache if fresh"""
+    key = '{}:{}'.format(network, port)
+    if cache is not None and not refresh:
+        found = cache.get(key)
+        if found is not None:
+            return found
+
+    found = asyncio.run(scan(network, port, timeout))
+    if cache is not None:
+        cache.put(key, found)
+    return found
+
+
+def do_options():
+    a = argparse.ArgumentParser('Find SP108E controllers on a network')
+    a.add_argument('network', help='Network to scan, e.g. 192.168.1.0/24')
+    a.add_argument('-p', '--port', action='store', type=int, default=8189)
+    a.add_argument('--timeout', action='store', type=float, default=0.5)
+    a.add_argument('--cache', action='store', default=os.path.expanduser(
+        '~/.cache/sp108e/discover.json'
+    ))
+    a.add_argument('--ttl', action='store', type=float, default=300)
+    a.add_argument('--refresh', action='store_true', default=False,
+                   help='Ignore any cached results')
+    return a.parse_args()
+
+
+def main(args):
+    cache = Cache(args.cache, args.ttl)
+    found = discover(
+        args.network, args.port, args.timeout, cache, args.refresh
+    )
+    for host, name in sorted(found.items()):
+        print("{} {}".format(host, name))
+
+
+if __name__ == '__main__':
+    args = do_options()
+    main(args)
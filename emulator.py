@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+#
+# Pretend to be a SP108E, following the protocol described in notes.txt,
+# so that clients can be tested without the hardware
+
+import argparse
+import queue
+import random
+import socket
+import socketserver
+import threading
+import time
+
+import commands as cmd
+import preview
+import structures
+
+DEFAULT_STATUS = structures.DeviceStatus.from_bytes(bytes.fromhex(
+    '3801fc80ff0200320001ff00000300ff83'
+))
+
+
+class EmulatorHandler(socketserver.BaseRequestHandler):
+    """One client connection
+
+    The controller has no packet framing beyond the fixed sizes, so after a
+    CMD_CUSTOM_PREVIEW everything received is treated as preview frames.
+    Replies are sent from a separate thread, so that their latency acts
+    like network delay and does not hold up reading the next packet.
+    """
+
+    def _reply_loop(self, replies):
+        while True:
+            due, reply = replies.get()
+            if reply is None:
+                return
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.request.sendall(reply)
+            except OSError:
+                return
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        replies = queue.Queue()
+        thread = threading.Thread(target=self._reply_loop, args=(replies,))
+        thread.start()
+        try:
+            self._handle(replies)
+        finally:
+            replies.put((0, None))
+            thread.join()
+
+    def _handle(self, replies):
+        server = self.server
+        due = 0         # replies keep their order, whatever the jitter
+        in_preview = False
+
+        while True:
+            # read no further than this packet, so that how many recv() it
+            # took says how it was split, not where a read happened to end
+            need = preview.FRAME_SIZE if in_preview else 6
+            buf = bytearray()
+            recvs = 0
+            while len(buf) < need:
+                data = self.request.recv(need - len(buf))
+                if not data:
+                    return
+                buf += data
+                recvs += 1
+
+            packet = bytes(buf)
+            split = recvs > 1
+
+            if in_preview:
+                reply = server.preview_frame(packet, split)
+            else:
+                reply = server.command(packet)
+                if packet[4] == cmd.CMD_CUSTOM_PREVIEW:
+                    in_preview = True
+
+            if reply is not None:
+                due = max(
+                    due, time.monotonic() + server.inbound + server.delay()
+                )
+                replies.put((due, reply))
+
+
+class Emulator(socketserver.ThreadingTCPServer):
+    """A fake controller, listening on address
+
+    Packets take inbound seconds to arrive: a preview frame is counted as
+    displayed that long after it was read, at the time.perf_counter() kept
+    in frame_times, and its reply is held back by it too.  Replies are
+    then delayed by latency plus or minus up to jitter seconds.  A
+    fraction drop_acks of the preview frame acks are never sent.  With
+    split_corrupts, a frame that did not arrive in a single recv() is
+    counted as corrupt and shown shifted, like the real device does.  With
+    mss set, the listening socket advertises that maximum segment size, so
+    clients really do send larger frames split into several segments.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0, jitter=0.0,
+                 inbound=0.0, drop_acks=0.0, split_corrupts=False, mss=None,
+                 name='SP108E_emulator', seed=None):
+        self.mss = mss
+        super().__init__(address, EmulatorHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.inbound = inbound
+        self.drop_acks = drop_acks
+        self.split_corrupts = split_corrupts
+        self.name = name
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.status = DEFAULT_STATUS
+        self.packets = []       # every command packet received
+        self.frame = None       # the currently displayed preview frame
+        self.frames = 0
+        self.frame_times = []   # when each preview frame was displayed
+        self.corrupt_frames = 0
+        self.dropped_acks = 0
+        self.thread = None
+
+    def server_bind(self):
+        if self.mss is not None:
+            self.socket.setsockopt(
+                socket.IPPROTO_TCP, socket.TCP_MAXSEG, self.mss
+            )
+        super().server_bind()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """Serve from a background thread"""
+        self.thread = threading.Thread(
+            target=self.serve_forever,
+            args=(0.05,)
+        )
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+    def delay(self):
+        """Return how long the next reply should take"""
+        delay = self.latency
+        if self.jitter:
+            delay += self.random.uniform(-self.jitter, self.jitter)
+        return max(0.0, delay)
+
+    def _update(self, **fields):
+        self.status = self.status._replace(**fields)
+
+    def command(self, packet):
+        """Act on a command packet, returning the reply if there is one"""
+        if packet[0] != cmd.CMD_FRAME_START or packet[5] != cmd.CMD_FRAME_END:
+            return None
+
+        cmdnr = packet[4]
+        data = packet[1:4]
+        value = int.from_bytes(data[0:2], 'little')
+
+        with self.lock:
+            self.packets.append(packet)
+
+            if cmdnr == cmd.CMD_CHECK_DEVICE:
+                challenge = int.from_bytes(data, 'little')
+                return cmd.check_device_reply(challenge)
+            if cmdnr == cmd.CMD_SYNC:
+                return self.status.to_bytes()
+            if cmdnr == cmd.CMD_GET_DEVICE_NAME:
+                return b'\x00' + self.name.encode('utf8')
+            if cmdnr == cmd.CMD_TOGGLE_LAMP:
+                self._update(lamp=self.status.lamp ^ 1)
+                return bytes([self.status.lamp])
+            if cmdnr == cmd.CMD_GET_RECORD_NUM:
+                return b'\x00'
+            if cmdnr == cmd.CMD_CUSTOM_PREVIEW:
+                self._update(mode=0)
+                return preview.ACK
+            if cmdnr in (
+                cmd.CMD_CUSTOM_DELETE,
+                cmd.CMD_CUSTOM_RECODE,
+                cmd.CMD_CHECK_DEVICE_IS_COOL,
+            ):
+                return b'\x31'
+
+            if cmdnr == cmd.CMD_BRIGHTNESS:
+                self._update(brightness=data[0])
+            elif cmdnr == cmd.CMD_SPEED:
+                self._update(speed=data[0])
+            elif cmdnr == cmd.CMD_MODE_CHANGE:
+                self._update(mode=data[0])
+            elif cmdnr == cmd.CMD_MODE_AUTO:
+                self._update(mode=cmd.MODE_AUTO)
+            elif cmdnr == cmd.CMD_COLOR:
+                self._update(color=data)
+            elif cmdnr == cmd.CMD_DOT_COUNT:
+                self._update(dotperseg=value)
+            elif cmdnr == cmd.CMD_SEC_COUNT:
+                self._update(segs=value)
+            elif cmdnr == cmd.CMD_SET_IC_MODEL:
+                self._update(ic_model=data[0])
+            elif cmdnr == cmd.CMD_SET_RGB_SEQ:
+                self._update(rgb_order=data[0])
+            return None
+
+    def preview_frame(self, frame, split):
+        """Display a preview frame, returning the ack if one is sent"""
+        shown = time.perf_counter() + self.inbound
+        with self.lock:
+            self.frames += 1
+            self.frame_times.append(shown)
+            if split and self.split_corrupts:
+                self.corrupt_frames += 1
+                frame = frame[1:] + frame[:1]
+            self.frame = frame
+
+            if self.drop_acks and self.random.random() < self.drop_acks:
+                self.dropped_acks += 1
+                return None
+        return preview.ACK
+
+
+def do_options():
+    a = argparse.ArgumentParser('Emulate a SP108E')
+    a.add_argument('-H', '--host', action='store', default='127.0.0.1')
+    a.add_argument('-p', '--port', action='store', type=int, default=8189)
+    a.add_argument('--latency', action='store', type=float, default=0.0)
+    a.add_argument('--jitter', action='store', type=float, default=0.0)
+    a.add_argument('--inbound', action='store', type=float, default=0.0,
+                   help='One way delay of packets to the emulator')
+    a.add_argument('--drop-acks', action='store', type=float, default=0.0)
+    a.add_argument('--split-corrupts', action='store_true', default=False)
+    a.add_argument('--mss', action='store', type=int, default=None,
+                   help='Maximum TCP segment size to advertise')
+    return a.parse_args()
+
+
+def main(args):
+    server = Emulator(
+        (args.host, args.port),
+        latency=args.latency,
+        jitter=args.jitter,
+        inbound=args.inbound,
+        drop_acks=args.drop_acks,
+        split_corrupts=args.split_corrupts,
+        mss=args.mss,
+    )
+    print("Listening on {}:{}".format(*server.server_address))
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    args = do_options()
+    main(args)
@@ -0,0 +1,430 @@
+"""Decoding of the ESP-TOUCH wifi configuration sent by the app
+
+See the WIFI configure section of notes.txt for what is known about the
+protocol.  The packet lengths carry the data, so only the UDP payload
+length and the destination address of each packet matter.
+"""
+
+import concurrent.futures
+import socket
+import struct
+import time
+
+import scheduler
+
+PORT = 7001
+HEADERS = 42            # ethernet + ip + udp header bytes
+EXTRA_LEN = 0x28        # added to every length, to stay clear of headers
+COUNTER_START = 0x128   # the first data triplet counter value
+SYNC_START = 0x203
+SYNC_END = 0x200
+SYNC = (0x203, 0x202, 0x201, 0x200)
+
+_pcap_header = struct.Struct('IHHiIII')
+_pcap_record = struct.Struct('IIII')
+
+# ethertype, ip version and header length, ip protocol, last byte of the
+# ip destination, udp source port, udp destination port
+_packet_header = struct.Struct('!12xHB8xB9xBHH')
+
+LINKTYPE_ETHERNET = 1
+
+
+def read_pcap(f):
+    """Generate (timestamp, packet) from a pcap file object
+
+    Only the record being returned is held in memory, so this works on
+    captures of any size.
+    """
+    header = f.read(_pcap_header.size)
+    magic = header[0:4]
+    if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+        order = '<'
+    elif magic in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
+        order = '>'
+    else:
+        raise ValueError('not a pcap file')
+    nano = magic in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d')
+    divisor = 1e9 if nano else 1e6
+
+    fields = struct.unpack(order + _pcap_header.format, header)
+    if fields[6] != LINKTYPE_ETHERNET:
+        raise ValueError('only ethernet captures are supported')
+
+    record = struct.Struct(order + _pcap_record.format)
+    while True:
+        header = f.read(record.size)
+        if len(header) < record.size:
+            return
+        seconds, fraction, length, orig_length = record.unpack(header)
+        packet = f.read(length)
+        if len(packet) < length:
+            return
+        yield seconds + fraction / divisor, packet
+
+
+def iter_lengths(packets, port=PORT):
+    """Generate (timestamp, ip_dest, data_len) for the config packets
+
+    This is the equivalent of the 'udp port 7001' capture filter.
+    """
+    unpack = _packet_header.unpack_from
+    minimum = _packet_header.size
+    for timestamp, packet in packets:
+        if len(packet) < minimum:
+            continue
+        ethertype, version, protocol, ip_dest, sport, dport = unpack(packet)
+        if (ethertype != 0x0800 or version != 0x45 or protocol != 17 or
+                (sport != port and dport != port)):
+            continue
+        yield timestamp, ip_dest, len(packet) - HEADERS
+
+
+class Decoder(object):
+    """Reassemble the data triplets from a stream of packet lengths
+
+    Each packet is given to feed(), which returns a line describing any
+    problem found (or every triplet, if verbose), or None.  The decoded
+    triplets build up in data, indexed by their counter.
+    """
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.time_first = None
+
+        self.sync_prev = None        # track the most recent sync value
+
+        self.data_set = None         # track the ip_dest for the current group
+        self.data1_curr = None       # track the first in each group of three
+        self.data2_index = None      # track the second in each group of three
+        self.data_index_prev = None  # track the counter
+
+        self.data = {}
+
+    def _reset_triplet(self):
+        self.data_set = None
+        self.data1_curr = None
+        self.data2_index = None
+
+    def feed(self, timestamp, ip_dest, data_len):
+        if self.time_first is None:
+            self.time_first = timestamp
+        time_delta = timestamp - self.time_first
+
+        if data_len >= SYNC_END:
+            return self._sync(time_delta, ip_dest, data_len)
+
+        msgs = []
+        if self.sync_prev is not None:
+            # The sync sequence didnt end properly
+            msgs.append("{:.3f} -1 -1 SYNC bad end".format(time_delta))
+            self.sync_prev = None
+
+        msg = self._triplet(time_delta, ip_dest, data_len)
+        if msg is not None:
+            msgs.append(msg)
+        return '\n'.join(msgs) or None
+
+    def _sync(self, time_delta, ip_dest, data_len):
+        if self.sync_prev is None:
+            self.sync_prev = data_len
+            if data_len != SYNC_START:
+                return "{:.3f} {:02x} {:03x} SYNC bad start".format(
+                    time_delta, ip_dest, data_len,
+                )
+            return None
+
+        msgs = []
+        if data_len != self.sync_prev-1:
+            msgs.append("{:.3f} {:02x} {:03x} SYNC detected missing".format(
+                time_delta, ip_dest, data_len,
+            ))
+
+        if data_len == SYNC_END:
+            # the final in a sync set
+            self.sync_prev = None
+            if self.verbose:
+                msgs.append("{:.3f} {:02x} {:03x} SYNC end".format(
+                    time_delta, ip_dest, data_len,
+                ))
+        else:
+            self.sync_prev = data_len
+
+        return '\n'.join(msgs) or None
+
+    def _triplet(self, time_delta, ip_dest, data_len):
+        if self.data_set is None:
+            # a fresh set of three values is arriving
+            self.data_set = ip_dest
+            self.data1_curr = data_len
+            return None
+
+        # we expect this to be a continuation of a previous triplet
+        if self.data_set != ip_dest:
+            self._reset_triplet()
+            return "{:.3f} {:02x} {:03x} TRIPLE bad".format(
+                time_delta, ip_dest, data_len,
+            )
+
+        if self.data2_index is None:
+            self.data2_index = data_len
+            return None
+
+        msgs = []
+        data_set = self.data_set
+        data1_curr = self.data1_curr
+        data2_index = self.data2_index
+        self._reset_triplet()
+
+        if (self.data_index_prev is not None and
+                data2_index != self.data_index_prev+1):
+            self.data_index_prev = None
+
+            if data2_index != COUNTER_START:
+                # only show error if it is not a restart
+                msgs.append("{:.3f} {:02x} {:03x} TRIPLE bad counter".format(
+                    time_delta, data_set, data2_index,
+                ))
+
+        if self.verbose:
+            msgs.append(
+                "{:.3f} {:02x} -1 TRIPLE {:03x}  {:03x} {:03x} {:010b} {:010b}"
+                .format(
+                    time_delta, data_set, data2_index,
+                    data1_curr, data_len, data1_curr, data_len,
+                )
+            )
+
+        if not triplet_crc_ok(data1_curr, data2_index, data_len):
+            msgs.append("{:.3f} {:02x} {:03x} TRIPLE bad crc".format(
+                time_delta, data_set, data2_index,
+            ))
+
+        if data2_index in self.data:
+            # confirm that the data has not changed
+            if self.data[data2_index] != (data1_curr, data_len):
+                msgs.append("{:.3f} {:02x} -1 DATA mismatch".format(
+                    time_delta, data_set,
+                ))
+        else:
+            self.data[data2_index] = (data1_curr, data_len)
+
+        # save the counter
+        self.data_index_prev = data2_index
+        return '\n'.join(msgs) or None
+
+    def decode(self):
+        """Return the config packet bytes decoded from the triplets"""
+        return bytes(
+            decode_byte(d0, d2)
+            for d0, d2 in (self.data[i] for i in sorted(self.data))
+        )
+
+
+def crc8(data):
+    """The Dallas/Maxim CRC8 used by ESP-TOUCH"""
+    crc = 0
+    for byte in data:
+        crc = _crc8_table[crc ^ byte]
+    return crc
+
+
+def _crc8_entry(value):
+    for bit in range(8):
+        if value & 1:
+            value = (value >> 1) ^ 0x8c
+        else:
+            value >>= 1
+    return value
+
+
+_crc8_table = bytes(_crc8_entry(i) for i in range(256))
+
+
+def decode_byte(d0, d2):
+    """Combine the first and last lengths of a triplet into a data byte
+
+    The high nibble of each length (after removing EXTRA_LEN) is half of a
+    crc, and the low nibble is half of the data byte.
+    """
+    return ((d0 - EXTRA_LEN) & 0xf) << 4 | ((d2 - EXTRA_LEN) & 0xf)
+
+
+def triplet_crc_ok(d0, counter, d2):
+    """Check the crc carried in a triplet against its data and index"""
+    crc = ((d0 - EXTRA_LEN) & 0xf0) | ((d2 - EXTRA_LEN) & 0xf0) >> 4
+    index = counter - COUNTER_START
+    return crc == crc8([decode_byte(d0, d2), index & 0xff])
+
+
+def encode_config(ssid, psk, ip, bssid=None):
+    """Build the config packet for the given wifi details
+
+    The ip is the address of the phone (or whatever is sending) and the
+    bssid is the six byte MAC address of the access point, which the
+    receiver uses to find it more quickly.
+    """
+    if isinstance(ssid, str):
+        ssid = ssid.encode('utf8')
+    if isinstance(psk, str):
+        psk = psk.encode('utf8')
+    ip = socket.inet_aton(ip)
+    bssid_crc = 0 if bssid is None else crc8(bssid)
+
+    packet = bytearray([
+        9 + len(psk) + len(ssid),
+        len(psk),
+        crc8(ssid),
+        bssid_crc,
+        0,                      # total xor, filled in below
+    ])
+    packet += ip + psk + ssid
+    if len(packet) > 0xff:
+        raise ValueError("ssid and psk are too long")
+
+    xor = 0
+    for byte in packet:
+        xor ^= byte
+    packet[4] = xor
+    return bytes(packet)
+
+
+def encode_data(packet):
+    """Return the (d0, counter, d2) length triplet for each packet byte"""
+    triplets = []
+    for index, byte in enumerate(packet):
+        crc = crc8([byte, index])
+        triplets.append((
+            EXTRA_LEN + ((crc & 0xf0) | byte >> 4),
+            COUNTER_START + index,
+            EXTRA_LEN + ((crc & 0xf) << 4 | (byte & 0xf)),
+        ))
+    return triplets
+
+
+def schedule(packet, sync_time=2.0, data_time=4.0, interval=0.008):
+    """Generate the lengths to send, each group with its own destination
+
+    Like the app, this alternates sync_time seconds of sync groups with
+    data_time seconds of repeating the data triplets, forever.  Each item
+    is (group, length), where packets of a group must share the same
+    destination address.
+    """
+    triplets = encode_data(packet)
+    sync_groups = max(1, int(sync_time / interval / len(SYNC)))
+    data_groups = max(len(triplets), int(data_time / interval / 3))
+
+    group = 0
+    while True:
+        for i in range(sync_groups):
+            for length in SYNC:
+                yield group, length
+            group += 1
+        for i in range(data_groups):
+            for length in triplets[i % len(triplets)]:
+                yield group, length
+            group += 1
+
+
+def multicast_address(group):
+    """The destination the app uses for a group of packets"""
+    n = group % 100
+    return '234.{}.{}.{}'.format(n + 1, n + 1, n + 1)
+
+
+class Sender(object):
+    """Send the length coded config as paced UDP packets
+
+    Every receiver listening at the time decodes the same packets, so one
+    run provisions any number of controllers at once.  Closing the sender
+    closes its socket, including one passed in as sock.
+    """
+
+    def __init__(self, interval=0.008, port=PORT, address=multicast_address,
+                 sock=None, clock=time.monotonic, sleep=time.sleep):
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        self.sock = sock
+        self.interval = interval
+        self.port = port
+        self.address = address
+        self.clock = clock
+        self.sleep = sleep
+        self.payload = memoryview(bytes(SYNC_START))
+        self.sent = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.sock.close()
+
+    def send(self, packet, duration=30.0):
+        """Send the config packet over and over for duration seconds"""
+        pacer = scheduler.FrameScheduler(
+            1 / self.interval, clock=self.clock, sleep=self.sleep
+        )
+        end = self.clock() + duration
+        prev_group = None
+        for group, length in schedule(packet, interval=self.interval):
+            if self.clock() >= end:
+                break
+            if group != prev_group:
+                target = (self.address(group), self.port)
+                prev_group = group
+            pacer.wait()
+            self.sock.sendto(self.payload[:length], target)
+            self.sent += 1
+        return pacer.stats()
+
+
+def parse_config(packet):
+    """Split up a decoded config packet, checking the length and xor"""
+    if len(packet) < 9:
+        raise ValueError("Received packet too short")
+
+    packet_len_total = packet[0]
+    packet_len_psk = packet[1]
+
+    # TODO - this may not be true if the BSSID has been appended (which is
+    # done in the published ESP TOUCH android app source)
+    if len(packet) != packet_len_total:
+        raise ValueError("Received packet length mismatch")
+
+    xor = 0
+    for byte in packet:
+        xor ^= byte
+    if xor != 0:
+        raise ValueError("Received packet failed xor test")
+
+    return {
+        'ssid_crc': packet[2],
+        'bssid_crc': packet[3],
+        'ip': '.'.join(str(b) for b in packet[5:9]),
+        'psk': packet[9:9 + packet_len_psk],
+        'ssid': packet[9 + packet_len_psk:packet_len_total],
+    }
+
+
+def decode_file(path, verbose=False):
+    """Decode one capture, returning the log lines and the decoder"""
+    decoder = Decoder(verbose)
+    log = []
+    with open(path, 'rb') as f:
+        for timestamp, ip_dest, data_len in iter_lengths(read_pcap(f)):
+            msg = decoder.feed(timestamp, ip_dest, data_len)
+            if msg is not None:
+                log.append(msg)
+    return log, decoder
+
+
+def decode_files(paths, verbose=False, workers=None):
+    """Decode many captures in parallel, yielding results in order"""
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        yield from executor.map(
+            decode_file, paths, [verbose] * len(paths)
+        )
@@ -0,0 +1,192 @@
+"""Drive several controllers from one large canvas of pixels"""
+
+import collections
+import concurrent.futures
+import random
+import statistics
+import time
+
+import commands as cmd
+import connection
+import preview
+import structures
+
+
+class Controller(object):
+    """One controller, and the part of the canvas that it displays
+
+    The controller shows count pixels starting at pixel offset of the
+    canvas.  If a layout.Layout is given as mapping, it is applied to that
+    slice to put the pixels into LED order, and count defaults to the
+    number of source pixels it uses.
+    """
+
+    def __init__(self, host, port=8189, offset=0, dotcount=None,
+                 count=None, mapping=None, window=2, mss=None,
+                 metrics=None):
+        if dotcount is None:
+            if mapping is None:
+                raise ValueError('need a dotcount or a mapping')
+            dotcount = len(mapping)
+        if count is None:
+            if mapping is None:
+                count = dotcount
+            else:
+                count = max(mapping.indices) + 1
+
+        self.host = host
+        self.port = port
+        self.offset = offset
+        self.dotcount = dotcount
+        self.count = count
+        self.mapping = mapping
+        self.window = window
+        self.mss = mss
+        self.metrics = metrics
+        self.rtt = 0.0
+        self.sock = None
+        self.stream = None
+        self.buf = bytearray(preview.FRAME_SIZE)
+
+    def __str__(self):
+        fqname = self.__class__.__name__
+        return "{}({}:{})".format(fqname, self.host, self.port)
+
+    def measure_rtt(self, samples=5):
+        """Time some check_device round trips, keeping the median
+
+        This has to be done before the controller is in preview mode.
+        """
+        times = []
+        for i in range(samples):
+            challenge = random.randrange(0x1000000)
+            start = time.perf_counter()
+            self.sock.sendall(cmd.check_device(challenge))
+            r = self.sock.recv(4096)
+            times.append(time.perf_counter() - start)
+            if r != cmd.check_device_reply(challenge):
+                raise ValueError(
+                    "{} bad check_device reply {}".format(self, r.hex())
+                )
+        self.rtt = statistics.median(times)
+        return self.rtt
+
+    def connect(self, samples=5):
+        self.sock = connection.connect(self.host, self.port, mss=self.mss)
+        if samples:
+            self.measure_rtt(samples)
+        self.stream = preview.PreviewStream(
+            self.sock, self.window,
+            segment=preview.frame_segment(self.sock),
+            metrics=self.metrics,
+        )
+        self.stream.start()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = None
+        self.stream = None
+
+    def frame(self, canvas):
+        """Build this controller's preview frame from the canvas"""
+        pixels = canvas[self.offset * 3:(self.offset + self.count) * 3]
+        if self.mapping is not None:
+            pixels = self.mapping.gather(pixels)
+        return preview.build_frame(pixels, self.dotcount, buf=self.buf)
+
+    def send(self, canvas, block, when=None):
+        """Send the frame, at the perf_counter() time when if given
+
+        Returns if it was sent and an estimate of when it was displayed,
+        taken as half the round trip time after the send finished.
+        """
+        frame = self.frame(canvas)
+        if when is not None:
+            delay = when - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        sent = self.stream.send(frame, block)
+        return sent, time.perf_counter() + self.rtt / 2
+
+
+class FanOut(object):
+    """Send each canvas to all the controllers at the same time
+
+    Every controller is handled by its own worker thread.  The skew is the
+    time between the first and last controller displaying a frame, as
+    estimated from when each send finished plus half its round trip time.
+    That assumes the network delay is the same both ways, which cannot be
+    checked from here.  The skew of each of the last history frames is
+    kept in skews.
+
+    When aligned is set, the controllers with shorter round trip times
+    delay their sends, so that all of them should display the frame at
+    the same time as the slowest one.
+    """
+
+    def __init__(self, controllers, aligned=False, history=1000):
+        self.controllers = list(controllers)
+        self.aligned = aligned
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(self.controllers)
+        )
+        self.frames = 0
+        self.skew = 0.0
+        self.skew_max = 0.0
+        self.skews = collections.deque(maxlen=history)
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _each(self, func, *args):
+        """Call func(controller, *args) for every controller in parallel"""
+        futures = [
+            self.executor.submit(func, controller, *args)
+            for controller in self.controllers
+        ]
+        return [future.result() for future in futures]
+
+    def connect(self):
+        """Connect every controller, closing them all if any one fails"""
+        try:
+            self._each(Controller.connect)
+        except BaseException:
+            self.close()
+            raise
+
+    def send(self, canvas, block=False):
+        """Send a frame from the canvas, return which controllers sent it"""
+        if isinstance(canvas, structures.PixelBuffer):
+            canvas = canvas.view
+        canvas = memoryview(canvas).cast('B')
+
+        if self.aligned:
+            slowest = max(controller.rtt for controller in self.controllers)
+            start = time.perf_counter()
+            results = self._each(
+                lambda controller: controller.send(
+                    canvas, block, start + (slowest - controller.rtt) / 2
+                )
+            )
+        else:
+            results = self._each(Controller.send, canvas, block)
+
+        times = [when for sent, when in results if sent]
+        if times:
+            self.frames += 1
+            self.skew = max(times) - min(times)
+            self.skew_max = max(self.skew_max, self.skew)
+            self.skews.append(self.skew)
+        return [sent for sent, when in results]
+
+    def flush(self):
+        self._each(lambda controller: controller.stream.flush())
+
+    def close(self):
+        self._each(Controller.close)
+        self.executor.shutdown()
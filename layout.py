@@ -0,0 +1,110 @@
+"""Mappings from source image pixels to the LEDs in a display"""
+
+import operator
+
+
+class Layout(object):
+    """The source pixel index for each LED, compiled into one gather"""
+
+    __slots__ = ('indices', '_getter')
+
+    def __init__(self, indices):
+        self.indices = tuple(indices)
+        if not self.indices:
+            raise ValueError('Layout needs at least one LED')
+
+        # Every byte index is looked up by a single C level call
+        self._getter = operator.itemgetter(*[
+            index * 3 + channel
+            for index in self.indices
+            for channel in range(3)
+        ])
+
+    def __len__(self):
+        return len(self.indices)
+
+    def gather(self, rgb):
+        """Return the packed RGB pixels for each LED, in LED order"""
+        return bytes(self._getter(rgb))
+
+
+def grid(width, height, serpentine=False, rotation=0, mirror=False):
+    """LEDs wired in rows across a width x height source image
+
+    The image is first rotated clockwise by rotation degrees and then, if
+    mirror is set, flipped left to right.  The LEDs then run along each
+    row, with every second row running backwards when serpentine is set.
+    """
+    if rotation not in (0, 90, 180, 270):
+        raise ValueError('rotation must be 0, 90, 180 or 270')
+
+    if rotation in (90, 270):
+        rows, cols = width, height
+    else:
+        rows, cols = height, width
+
+    indices = []
+    for ry in range(rows):
+        xs = range(cols)
+        if mirror != (serpentine and ry % 2 == 1):
+            xs = reversed(xs)
+        for rx in xs:
+            if rotation == 0:
+                sx, sy = rx, ry
+            elif rotation == 90:
+                sx, sy = ry, height - 1 - rx
+            elif rotation == 180:
+                sx, sy = width - 1 - rx, height - 1 - ry
+            else:
+                sx, sy = width - 1 - ry, rx
+            indices.append(sy * width + sx)
+    return Layout(indices)
+
+
+def serpentine(width, height):
+    """Rows alternate direction, with the first row running right to left
+
+    This is the wiring that x11-to-led.c assumes.
+    """
+    return grid(width, height, serpentine=True, mirror=True)
+
+
+def segments(sec_count, dot_count, **kwargs):
+    """One row of the source image for each segment of the display
+
+    The arguments match the CMD_SEC_COUNT and CMD_DOT_COUNT settings, with
+    any others passed on to grid().
+    """
+    return grid(dot_count, sec_count, **kwargs)
+
+
+def read_indices(path):
+    """Load an explicit list of source pixel indices, one per LED
+
+    The numbers may be separated by whitespace or commas, and anything
+    after a # is a comment.
+    """
+    indices = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].replace(',', ' ')
+            indices.extend(int(field, 0) for field in line.split())
+    return Layout(indices)
+
+
+def compile(description):
+    """Build a Layout from a dict describing it
+
+    The dict has either a 'file' of indices, 'segments' and 'dots' counts,
+    or a 'width' and 'height', plus any of the options for grid().
+    """
+    description = dict(description)
+    if 'file' in description:
+        return read_indices(description.pop('file'))
+    if 'segments' in description:
+        return segments(
+            description.pop('segments'),
+            description.pop('dots'),
+            **description
+        )
+    return grid(**description)
@@ -0,0 +1,130 @@
+"""Latency histograms and counters for one controller
+
+Anything that takes a metrics argument skips all of this when it is
+None, so leaving metrics off costs a single comparison per operation.
+"""
+
+import bisect
+import collections
+import time
+
+import commands as cmd
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (
+    0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0,
+    float('inf'),
+)
+
+command_names = {
+    value: name[4:].lower()
+    for name, value in vars(cmd).items()
+    if name.startswith('CMD_') and name not in (
+        'CMD_FRAME_START', 'CMD_FRAME_END',
+    )
+}
+
+
+class Histogram(object):
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        return {
+            'buckets': dict(zip(BUCKETS, self.counts)),
+            'count': self.count,
+            'sum': self.sum,
+        }
+
+
+class Metrics(object):
+    """Everything recorded about one controller
+
+    The frame rate is measured over the last window seconds, so that it
+    follows the current rate rather than the lifetime average.
+    """
+
+    def __init__(self, name='', window=5.0, clock=time.monotonic):
+        self.name = name
+        self.window = window
+        self.clock = clock
+        self.started = clock()
+        self.latency = collections.defaultdict(Histogram)
+        self.counters = collections.Counter()
+        self.frame_times = collections.deque()
+
+    def observe(self, command, seconds):
+        """Record a round trip time, for a command number or name"""
+        command = command_names.get(command, command)
+        self.latency[command].observe(seconds)
+
+    def count(self, counter, value=1):
+        self.counters[counter] += value
+        if counter == 'frames_sent':
+            now = self.clock()
+            self.frame_times.extend([now] * value)
+            self._expire(now)
+
+    def _expire(self, now):
+        """Forget frames sent before the start of the window"""
+        times = self.frame_times
+        while times and times[0] <= now - self.window:
+            times.popleft()
+
+    def fps(self):
+        """Return the preview frames per second over the last window"""
+        now = self.clock()
+        self._expire(now)
+        elapsed = min(self.window, now - self.started)
+        if elapsed <= 0:
+            return 0.0
+        return len(self.frame_times) / elapsed
+
+    def snapshot(self):
+        return {
+            'name': self.name,
+            'counters': dict(self.counters),
+            'fps': self.fps(),
+            'latency': {
+                command: histogram.snapshot()
+                for command, histogram in self.latency.items()
+            },
+        }
+
+    def text(self):
+        """Return the metrics in the Prometheus text exposition format"""
+        lines = []
+        label = 'controller="{}"'.format(self.name)
+        for counter, value in sorted(self.counters.items()):
+            lines.append('sp108e_{}_total{{{}}} {}'.format(
+                counter, label, value
+            ))
+        lines.append('sp108e_fps{{{}}} {:.3f}'.format(label, self.fps()))
+
+        for command, histogram in sorted(self.latency.items()):
+            labels = '{},command="{}"'.format(label, command)
+            total = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                total += count
+                le = '+Inf' if bound == float('inf') else bound
+                lines.append(
+                    'sp108e_latency_seconds_bucket{{{},le="{}"}} {}'.format(
+                        labels, le, total
+                    )
+                )
+            lines.append('sp108e_latency_seconds_sum{{{}}} {:.6f}'.format(
+                labels, histogram.sum
+            ))
+            lines.append('sp108e_latency_seconds_count{{{}}} {}'.format(
+                labels, histogram.count
+            ))
+        return '\n'.join(lines) + '\n'
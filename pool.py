@@ -0,0 +1,104 @@
+"""Keep connections to controllers open between commands"""
+
+import random
+import socket
+import time
+
+import commands as cmd
+
+
+class ConnectionPool(object):
+    """A set of open sockets, keyed by (host, port)
+
+    A connection that has been idle for longer than check_interval is
+    verified with a check_device before being handed out again, and is
+    replaced if that fails.  Connecting retries with exponential backoff.
+    """
+
+    def __init__(self, timeout=2.0, check_interval=10.0, retries=5,
+                 backoff=0.1, backoff_max=5.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        if retries < 1:
+            raise ValueError("retries must be at least 1")
+
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.clock = clock
+        self.sleep = sleep
+
+        # (host, port) -> [socket, time it was last known to be working]
+        self.connections = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self, key):
+        delay = self.backoff
+        for attempt in range(self.retries):
+            if attempt:
+                self.sleep(delay)
+                delay = min(delay * 2, self.backoff_max)
+            try:
+                sock = socket.create_connection(key, self.timeout)
+            except OSError as e:
+                error = e
+                continue
+
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.connections[key] = [sock, self.clock()]
+            return sock
+
+        raise error
+
+    def _healthy(self, sock):
+        """Send a check packet, and confirm the result is sane"""
+        challenge = random.randrange(0x1000000)
+        try:
+            sock.sendall(cmd.check_device(challenge))
+            r = sock.recv(4096)
+        except OSError:
+            return False
+        return r == cmd.check_device_reply(challenge)
+
+    def discard(self, host, port=8189):
+        """Close and forget the connection, if there is one"""
+        entry = self.connections.pop((host, port), None)
+        if entry is not None:
+            entry[0].close()
+
+    def get(self, host, port=8189):
+        """Return a working socket connected to the controller"""
+        key = (host, port)
+        entry = self.connections.get(key)
+        if entry is not None:
+            sock, seen = entry
+            if self.clock() - seen < self.check_interval:
+                return sock
+            if self._healthy(sock):
+                entry[1] = self.clock()
+                return sock
+            self.discard(host, port)
+
+        return self._connect(key)
+
+    def call(self, host, port, func):
+        """Call func(sock), reconnecting and retrying once on errors"""
+        try:
+            result = func(self.get(host, port))
+        except OSError:
+            self.discard(host, port)
+            result = func(self.get(host, port))
+
+        self.connections[(host, port)][1] = self.clock()
+        return result
+
+    def close(self):
+        for sock, seen in self.connections.values():
+            sock.close()
+        self.connections.clear()
@@ -0,0 +1,265 @@
+"""Streaming of CMD_CUSTOM_PREVIEW frames to the controller"""
+
+import collections
+import functools
+import select
+import socket
+import time
+
+import commands as cmd
+import structures
+import tracelog
+from connection import txn_sync_expect
+
+FRAME_SIZE = 900    # Number of bytes in a frame
+ACK = b'\x31'       # sent by the controller for each preview frame
+
+
+def segment_size(mss):
+    """Round the MSS down to a whole number of 5 pixel (15 byte) groups"""
+    size = mss - mss % 15
+    if size < 15:
+        raise ValueError("mss is too small to carry any pixels")
+    return size
+
+
+def frame_segment(sock):
+    """Return the segment size to use for preview frames on this socket
+
+    None is returned when the negotiated MSS can carry a whole frame.
+    """
+    mss = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_MAXSEG)
+    if mss >= FRAME_SIZE:
+        return None
+    return segment_size(mss)
+
+
+@functools.lru_cache(maxsize=None)
+def frame_stride(dotcount):
+    """Return the number of bytes between displayed pixels in a frame"""
+    if dotcount < 1 or dotcount > FRAME_SIZE // 3:
+        raise ValueError("dotcount must be 1 - {}".format(FRAME_SIZE // 3))
+    return (FRAME_SIZE // 3) // dotcount * 3
+
+
+def build_frame(pixels, dotcount, start=0, buf=None):
+    """Scatter packed RGB pixels into a frame for the given dot count
+
+    The pixels can be a PixelBuffer or any bytes-like object, including an
+    (N, 3) uint8 array, and are written from pixel number start onwards.
+    Each color channel is copied with a single extended slice assignment,
+    rather than looping over the pixels.  When reusing a buf, any pixels
+    not written keep their old values.
+    """
+    if isinstance(pixels, structures.PixelBuffer):
+        pixels = pixels.view
+    pixels = memoryview(pixels).cast('B')
+    count = len(pixels) // 3
+    if len(pixels) % 3:
+        raise ValueError("pixels must be a multiple of 3 bytes long")
+    if start + count > dotcount:
+        raise ValueError("more pixels than dots")
+
+    stride = frame_stride(dotcount)
+    if buf is None:
+        buf = bytearray(FRAME_SIZE)
+
+    offset = start * stride
+    end = offset + count * stride
+    if stride == 3:
+        buf[offset:end] = pixels
+    else:
+        for channel in range(3):
+            buf[offset+channel:end:stride] = pixels[channel::3]
+
+    return buf
+
+
+class PreviewStream(object):
+    """Send preview frames with a bounded number of them awaiting an ack
+
+    The controller answers each complete frame with a single ACK byte, so
+    acks are matched to frames simply by counting them.  Once the window is
+    full, a new frame is held back as pending instead of being queued - any
+    older pending frame is stale by then and is dropped.
+
+    A frame identical to the previous one is not sent again, unless more
+    than keepalive seconds have passed since the last send.  A keepalive
+    of zero sends every frame.
+
+    If segment is set, each frame is written in pieces of that many bytes,
+    so with TCP_NODELAY each piece leaves as its own TCP segment rather
+    than being split at an arbitrary byte.
+
+    When no ack arrives within timeout, the oldest frame is counted as lost
+    and its slot in the window is freed, so the stream carries on after a
+    dropped ack.  Should the ack turn up late after all, it is ignored.
+
+    A metrics.Metrics passed as metrics records the ack latency and the
+    frame counts, and a record.Recorder passed as recorder saves a copy of
+    every frame sent.
+    """
+
+    def __init__(self, sock, window=2, timeout=1.0, keepalive=1.0,
+                 segment=None, metrics=None, recorder=None,
+                 clock=time.monotonic):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+
+        self.sock = sock
+        self.window = window
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.segment = segment
+        self.metrics = metrics
+        self.recorder = recorder
+        self.clock = clock
+        self.sent_times = collections.deque()
+
+        self.inflight = 0       # frames sent but not yet acked
+        self.pending = None     # newest frame waiting for room in the window
+        self.last = None        # the most recently sent frame
+        self.last_time = None
+        self.sent = 0
+        self.dropped = 0
+        self.unchanged = 0
+        self.lost = 0
+        self.overdue = 0        # lost frames whose ack may still turn up
+
+    def start(self):
+        """Switch the controller into preview mode"""
+        txn_sync_expect(
+            self.sock,
+            cmd.frame(cmd.CMD_CUSTOM_PREVIEW, None),
+            ACK
+        )
+
+    def _reap(self, timeout):
+        """Collect any acks that arrive within timeout"""
+        r, _, _ = select.select([self.sock], [], [], timeout)
+        if not r:
+            return 0
+
+        recvbytes = self.sock.recv(4096)
+        if tracelog.sinks:
+            tracelog.emit(tracelog.RX, recvbytes)
+        if not recvbytes:
+            raise ConnectionError("controller closed the connection")
+        acks = len(recvbytes)
+        late = max(0, acks - self.inflight)
+        if recvbytes.strip(ACK) or late > self.overdue:
+            raise ValueError(
+                "unexpected preview reply {}".format(recvbytes.hex())
+            )
+        self.overdue -= late
+        acks -= late
+
+        self.inflight -= acks
+        if self.metrics is not None:
+            now = self.clock()
+            for i in range(acks):
+                sent = self.sent_times.popleft()
+                self.metrics.observe('preview', now - sent)
+        return acks
+
+    def _wait(self):
+        """Block until at least one ack has arrived
+
+        On a timeout the oldest frame is written off before raising.
+        """
+        if not self._reap(self.timeout):
+            self.inflight -= 1
+            self.lost += 1
+            self.overdue += 1
+            if self.metrics is not None:
+                self.sent_times.popleft()
+                self.metrics.count('ack_timeouts')
+                self.metrics.count('frames_lost')
+            raise TimeoutError("no ack from controller")
+
+    def _send(self, frame):
+        if tracelog.sinks:
+            tracelog.emit(tracelog.TX, bytes(frame))
+        if self.segment is None:
+            self.sock.sendall(frame)
+        else:
+            view = memoryview(frame)
+            for offset in range(0, len(view), self.segment):
+                self.sock.sendall(view[offset:offset+self.segment])
+        self.inflight += 1
+        self.sent += 1
+        self.last = bytes(frame)
+        self.last_time = self.clock()
+        if self.recorder is not None:
+            self.recorder.write(frame, self.last_time)
+        if self.metrics is not None:
+            self.sent_times.append(self.last_time)
+            self.metrics.count('frames_sent')
+            self.metrics.count('bytes_sent', len(frame))
+
+    def _drop(self):
+        self.dropped += 1
+        if self.metrics is not None:
+            self.metrics.count('frames_dropped')
+
+    def _unchanged(self, frame):
+        """Check if the frame would not change what is displayed"""
+        if self.pending is not None and frame == self.pending:
+            # still held back only while there is no room to send it
+            return self.inflight >= self.window
+
+        if frame != self.last:
+            return False
+        if self.clock() - self.last_time >= self.keepalive:
+            return False
+
+        if self.pending is not None:
+            # the device is already showing this, the pending is stale
+            self._drop()
+            self.pending = None
+        return True
+
+    def send(self, frame, block=False):
+        """Send a frame, returning False if it was not sent right now
+
+        That happens when it was held back as pending, or when it was the
+        same as the previous frame.  With block set, wait for room in the
+        window instead of holding the frame back.
+        """
+        if self.inflight:
+            self._reap(0)
+
+        if self.keepalive and self._unchanged(frame):
+            self.unchanged += 1
+            if self.metrics is not None:
+                self.metrics.count('frames_unchanged')
+            return False
+
+        if self.inflight >= self.window:
+            if not block:
+                if self.pending is not None:
+                    self._drop()
+                self.pending = bytes(frame)
+                return False
+            while self.inflight >= self.window:
+                self._wait()
+
+        if self.pending is not None:
+            if frame != self.pending:
+                # Superseded by this newer frame
+                self._drop()
+            self.pending = None
+
+        self._send(frame)
+        return True
+
+    def flush(self):
+        """Send any pending frame and wait for every frame to be acked"""
+        if self.pending is not None:
+            while self.inflight >= self.window:
+                self._wait()
+            self._send(self.pending)
+            self.pending = None
+
+        while self.inflight:
+            self._wait()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+#
+# Send the wifi details to any SP108E controllers waiting to be configured,
+# the same way the "add device" option in the app does
+
+import argparse
+import socket
+
+import esptouch
+import tracelog
+
+
+def local_ip():
+    """Find the address used to reach the rest of the network"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # No packets are sent, this just picks a route
+        s.connect(('234.1.1.1', esptouch.PORT))
+        return s.getsockname()[0]
+    finally:
+        s.close()
+
+
+def do_options():
+    a = argparse.ArgumentParser('Configure the wifi on SP108E controllers')
+    a.add_argument('ssid')
+    a.add_argument('psk')
+    a.add_argument('--ip', action='store', default=None,
+                   help='Address of this machine, found automatically')
+    a.add_argument('--bssid', action='store', default=None,
+                   help='MAC address of the access point, e.g. 00:11:22:..')
+    a.add_argument('--duration', action='store', type=float, default=60)
+    a.add_argument('--interval', action='store', type=float, default=0.008)
+    return a.parse_args()
+
+
+def main(args):
+    bssid = None
+    if args.bssid:
+        bssid = bytes.fromhex(args.bssid.replace(':', ''))
+
+    config = esptouch.encode_config(
+        args.ssid, args.psk, args.ip or local_ip(), bssid
+    )
+    print(tracelog.hexdump(config))
+
+    with esptouch.Sender(args.interval) as sender:
+        stats = sender.send(config, args.duration)
+    print("Sent {} packets, {} late".format(sender.sent, stats['dropped']))
+
+
+if __name__ == '__main__':
+    args = do_options()
+    main(args)
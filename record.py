@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+#
+# Record preview frames to a file, and play them back to controllers with
+# the original timing
+
+import argparse
+import mmap
+import struct
+import time
+
+import connection
+import preview
+
+MAGIC = b'SP108RC1'
+_header = struct.Struct('<8sI')      # magic, frame size
+_record = struct.Struct('<dBHH')     # time, kind, start, length
+
+FULL = 0        # the whole frame follows
+REPEAT = 1      # the same as the previous frame
+SPAN = 2        # only the bytes from start to start+length changed
+
+
+def changed_span(prev, frame):
+    """Return the (start, end) of the bytes that differ, or None
+
+    Both frames are turned into integers and xored, so the search for
+    the first and last difference happens in C.
+    """
+    x = int.from_bytes(prev, 'big') ^ int.from_bytes(frame, 'big')
+    if not x:
+        return None
+    start = len(frame) - (x.bit_length() + 7) // 8
+    end = len(frame) - ((x & -x).bit_length() - 1) // 8
+    return start, end
+
+
+class Recorder(object):
+    """Write timestamped frames to a file
+
+    With delta set, a frame is stored as only the span of bytes that
+    changed from the previous one, or as a repeat if nothing changed.
+    """
+
+    def __init__(self, path, frame_size=preview.FRAME_SIZE, delta=True,
+                 clock=time.monotonic):
+        self.frame_size = frame_size
+        self.delta = delta
+        self.clock = clock
+        self.start = None
+        self.prev = None
+        self.frames = 0
+        self.f = open(path, 'wb')
+        self.f.write(_header.pack(MAGIC, frame_size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, frame, timestamp=None):
+        if len(frame) != self.frame_size:
+            raise ValueError('frame must be {} bytes'.format(self.frame_size))
+        if timestamp is None:
+            timestamp = self.clock()
+        if self.start is None:
+            self.start = timestamp
+        when = timestamp - self.start
+        frame = bytes(frame)
+
+        span = (0, self.frame_size)
+        kind = FULL
+        if self.delta and self.prev is not None:
+            span = changed_span(self.prev, frame)
+            kind = SPAN
+            if span is None:
+                span = (0, 0)
+                kind = REPEAT
+
+        start, end = span
+        self.f.write(_record.pack(when, kind, start, end - start))
+        self.f.write(frame[start:end])
+        self.prev = frame
+        self.frames += 1
+
+    def close(self):
+        self.f.close()
+
+
+class Player(object):
+    """Read back a recording, from a memory map of the file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < _header.size:
+            self.close()
+            raise ValueError('{} is not a recording'.format(path))
+        magic, self.frame_size = _header.unpack_from(self.map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError('{} is not a recording'.format(path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        """Generate (time, frame) for each frame recorded
+
+        The same frame buffer is updated in place and returned each time.
+        A truncated or damaged record raises ValueError, rather than
+        producing a frame of the wrong size.
+        """
+        view = memoryview(self.map)
+        frame = bytearray(self.frame_size)
+        offset = _header.size
+        try:
+            while offset < len(view):
+                if offset + _record.size > len(view):
+                    raise ValueError('truncated record at {}'.format(offset))
+                when, kind, start, length = _record.unpack_from(view, offset)
+                offset += _record.size
+                if offset + length > len(view):
+                    raise ValueError('truncated record at {}'.format(offset))
+                if start + length > self.frame_size:
+                    raise ValueError('bad record at {}'.format(offset))
+                frame[start:start+length] = view[offset:offset+length]
+                offset += length
+                yield when, frame
+        finally:
+            view.release()
+
+    def close(self):
+        self.map.close()
+
+
+def replay(player, streams, speed=1.0, clock=time.monotonic,
+           sleep=time.sleep):
+    """Send the recorded frames to every stream at the recorded times
+
+    When playback falls behind, frames are sent without waiting, and the
+    streams drop any that they have no room for.
+    """
+    start = clock()
+    frames = 0
+    for when, frame in player:
+        delay = start + when / speed - clock()
+        if delay > 0:
+            sleep(delay)
+        for stream in streams:
+            stream.send(frame)
+        frames += 1
+    for stream in streams:
+        stream.flush()
+    return frames
+
+
+def do_options():
+    a = argparse.ArgumentParser('Play recorded preview frames to SP108Es')
+    a.add_argument('-H', '--host', action='append', default=None,
+                   help='Controller to play to, may be given several times')
+    a.add_argument('-p', '--port', action='store', default='8189')
+    a.add_argument('--mss', action='store', type=int, default=None,
+                   help='Clamp the TCP MSS down to this')
+    a.add_argument('--speed', action='store', type=float, default=1.0)
+    a.add_argument('--loop', action='store_true', default=False)
+    a.add_argument('file')
+    return a.parse_args()
+
+
+def main(args):
+    streams = []
+    for host in args.host or ['192.168.4.1']:
+        print("Connecting to {}:{}".format(host, int(args.port, 0)))
+        sock = connection.connect(host, int(args.port, 0), mss=args.mss)
+        stream = preview.PreviewStream(
+            sock, segment=preview.frame_segment(sock)
+        )
+        stream.start()
+        streams.append(stream)
+
+    with Player(args.file) as player:
+        while True:
+            frames = replay(player, streams, args.speed)
+            print("Played {} frames".format(frames))
+            if not args.loop:
+                break
+
+
+if __name__ == '__main__':
+    args = do_options()
+    main(args)
@@ -0,0 +1,71 @@
+"""Pacing of frames to a steady rate"""
+
+import math
+import time
+
+
+class FrameScheduler(object):
+    """Wait for evenly spaced frame deadlines on a monotonic clock
+
+    Deadlines are a fixed number of periods from the first one, so small
+    delays do not accumulate.  If the caller falls more than a whole
+    period behind, the missed deadlines are dropped instead of being
+    rushed through to catch up.
+    """
+
+    def __init__(self, fps, clock=time.monotonic, sleep=time.sleep):
+        if fps <= 0:
+            raise ValueError("fps must be positive")
+
+        self.period = 1.0 / fps
+        self.clock = clock
+        self.sleep = sleep
+        self.deadline = None
+
+        self.frames = 0
+        self.dropped = 0
+        self._late_sum = 0.0
+        self._late_sumsq = 0.0
+        self._late_max = 0.0
+
+    def wait(self):
+        """Sleep until the next frame is due, return the number dropped"""
+        now = self.clock()
+        if self.deadline is None:
+            self.deadline = now
+        else:
+            self.deadline += self.period
+
+        dropped = 0
+        if now - self.deadline >= self.period:
+            dropped = int((now - self.deadline) // self.period)
+            self.deadline += dropped * self.period
+            self.dropped += dropped
+
+        if now < self.deadline:
+            self.sleep(self.deadline - now)
+            now = self.clock()
+
+        late = max(0.0, now - self.deadline)
+        self.frames += 1
+        self._late_sum += late
+        self._late_sumsq += late * late
+        self._late_max = max(self._late_max, late)
+        return dropped
+
+    def stats(self):
+        """Return a dict of frame counts and lateness in seconds"""
+        mean = 0.0
+        jitter = 0.0
+        if self.frames:
+            mean = self._late_sum / self.frames
+            jitter = math.sqrt(
+                max(0.0, self._late_sumsq / self.frames - mean * mean)
+            )
+        return {
+            'frames': self.frames,
+            'dropped': self.dropped,
+            'late_mean': mean,
+            'late_max': self._late_max,
+            'jitter': jitter,
+        }
@@ -0,0 +1,78 @@
+"""A client side mirror of the controller state"""
+
+import commands as cmd
+import structures
+from connection import txn, txn_sync
+
+
+class CachedDevice(object):
+    """Skip sending commands that would not change the controller state
+
+    The mirror is seeded by refresh(), which asks for the CMD_SYNC status.
+    Until then, or after any error, the mirror is invalid and every
+    command is sent.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.status = None
+        self.sent = 0
+        self.skipped = 0
+
+    def invalidate(self):
+        self.status = None
+
+    def refresh(self):
+        """Reload the status, returning what changed since the last one"""
+        prev = self.status
+        self.status = None
+        status = structures.DeviceStatus.from_bytes(
+            txn_sync(self.sock, cmd.sync())
+        )
+        self.status = status
+        return status.diff(prev)
+
+    def _set(self, packet, **fields):
+        """Send the packet, unless the fields already have these values"""
+        status = self.status
+        if status is not None and all(
+            getattr(status, field) == value
+            for field, value in fields.items()
+        ):
+            self.skipped += 1
+            return False
+
+        try:
+            txn(self.sock, packet)
+        except OSError:
+            self.invalidate()
+            raise
+
+        if status is not None:
+            self.status = status._replace(**fields)
+        self.sent += 1
+        return True
+
+    def brightness(self, value):
+        return self._set(cmd.brightness(value), brightness=value)
+
+    def speed(self, speed):
+        return self._set(cmd.speed(speed), speed=speed)
+
+    def mode_change(self, mode):
+        return self._set(cmd.mode_change(mode), mode=mode)
+
+    def color(self, rgb):
+        return self._set(cmd.color(rgb), color=rgb.bytes)
+
+    def dot_count(self, value):
+        return self._set(cmd.dot_count(value), dotperseg=value)
+
+    def sec_count(self, value):
+        return self._set(cmd.sec_count(value), segs=value)
+
+    def rgb_seq(self, order):
+        return self._set(cmd.rgb_seq(order), rgb_order=order)
+
+    def set_ic_model(self, model):
+        return self._set(cmd.set_ic_model(model), ic_model=model)
@@ -1,5 +1,6 @@
 
-# import struct
+import collections
+import struct
 
 
 class RGB(object):
@@ -26,3 +27,117 @@ class RGB(object):
             fqname,
             self.bytes[0], self.bytes[1], self.bytes[2]
         )
+
+
+class PixelBuffer(object):
+    """A strip of RGB pixels held in one contiguous buffer"""
+
+    __slots__ = ('view',)
+
+    def __init__(self, count=0, data=None):
+        if data is None:
+            data = bytearray(count * 3)
+        view = memoryview(data).cast('B')
+        if len(view) % 3:
+            raise ValueError('PixelBuffer data must be a multiple of 3 bytes')
+        self.view = view
+
+    def __len__(self):
+        return len(self.view) // 3
+
+    def _index(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('pixel index out of range')
+        return index * 3
+
+    def __getitem__(self, index):
+        """Return a memoryview of one pixel, or a PixelBuffer of a slice"""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError('PixelBuffer slices must be contiguous')
+            return PixelBuffer(data=self.view[start*3:max(start, stop)*3])
+
+        offset = self._index(index)
+        return self.view[offset:offset+3]
+
+    def __setitem__(self, index, rgb):
+        if isinstance(rgb, RGB):
+            rgb = rgb.bytes
+        offset = self._index(index)
+        self.view[offset:offset+3] = rgb
+
+    def __eq__(self, other):
+        if isinstance(other, PixelBuffer):
+            other = other.view
+        return self.view == other
+
+    def __str__(self):
+        fqname = self.__class__.__name__
+        return "{}({})".format(fqname, self.view.hex())
+
+    def fill(self, rgb, start=0, stop=None):
+        """Set a range of pixels to the same color"""
+        if isinstance(rgb, RGB):
+            rgb = rgb.bytes
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if stop > start:
+            self.view[start*3:stop*3] = bytes(rgb) * (stop - start)
+
+    def blit(self, src, offset=0):
+        """Copy the pixels from src into this buffer, starting at offset"""
+        if isinstance(src, PixelBuffer):
+            src = src.view
+        src = memoryview(src).cast('B')
+        self.view[offset*3:offset*3+len(src)] = src
+
+
+class DeviceStatus(collections.namedtuple('DeviceStatus', [
+    'lamp',
+    'mode',
+    'speed',
+    'brightness',
+    'rgb_order',
+    'dotperseg',
+    'segs',
+    'color',
+    'ic_model',
+    'unknown14',
+    'unknown15',
+])):
+    """The decoded reply to a CMD_SYNC"""
+
+    __slots__ = ()
+
+    # framing, fields as above, framing
+    _struct = struct.Struct('>6B2H3s4B')
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) != cls._struct.size:
+            raise ValueError('status must be {} bytes long'.format(
+                cls._struct.size
+            ))
+        fields = cls._struct.unpack_from(data)
+        if fields[0] != 0x38 or fields[-1] != 0x83:
+            raise ValueError('status has bad framing bytes')
+        return cls._make(fields[1:-1])
+
+    def to_bytes(self):
+        return self._struct.pack(0x38, *self, 0x83)
+
+    @property
+    def staticcolor(self):
+        return RGB(self.color)
+
+    def diff(self, prev):
+        """Return a dict of (prev, current) values for any changed fields"""
+        if prev is None:
+            prev = (None,) * len(self)
+        return {
+            field: (old, new)
+            for field, old, new in zip(self._fields, prev, self)
+            if old != new
+        }
@@ -5,71 +5,20 @@
 
 import argparse
 
-import socket
 import random
 
 import commands as cmd
+import connection
+import preview
+import scheduler
 import structures
-
-
-def txn(sock, sendbytes):
-    """ Perform a tx transaction """
-
-    # TODO - if verbose
-    print("> {}".format(sendbytes.hex()))
-
-    sock.send(sendbytes)
-
-
-def rxn(sock):
-    """ Listen for a reply packet """
-    recvbytes = sock.recv(4096)
-
-    # TODO - if verbose
-    print("< {}".format(recvbytes.hex()))
-
-    return recvbytes
-
-
-def txn_sync(sock, sendbytes):
-    """ Perform a synchronous tx/rx transaction """
-
-    txn(sock, sendbytes)
-    return rxn(sock)
-
-
-def txn_sync_expect(sock, sendbytes, expectbytes):
-    """ Perform a txn_sync() and confirm the result is as expected """
-    r = txn_sync(sock, sendbytes)
-    assert(r == expectbytes)
-    return r
-
-
-def cmd_check_device(sock, challenge):
-    """Send a check packet, and confirm the result is sane"""
-    if challenge is None:
-        challenge = 0x73a52b  # chosen by a fair dice roll
-
-    r = txn_sync(sock, cmd.check_device(challenge))
-
-    assert r[0] == 1
-    assert r[1] == 2
-    assert r[2] == 3
-    assert r[3] == 4
-    assert r[4] == 5
-    assert r[5] == (
-        challenge & 0x53 |
-        (challenge & 0x3f00) >> 6 |
-        (challenge & 0xe00000) >> 21
-    )
-
-    return r[5]
-
-
-#############################################################################
-#
-# Above this line, code should be generic enough to be turned into a library
-#
+import tracelog
+from connection import (
+    cmd_check_device,
+    rxn,
+    txn,
+    txn_sync,
+)
 
 
 def assert_frame(data):
@@ -94,30 +43,13 @@ def assert_status_unknown(data):
 
 def test_frame(dotcount, firstrandom, firstfill):
     """Generate a single frame to send to the array"""
-    maxlen = 900        # Number of bytes in a frame
-    stride = (maxlen // 3) // dotcount * 3
-
-    offset = firstrandom*stride   # address of first non blank pixel
-    minlen1 = firstfill*stride    # address of last pixel with random color
-    maxdots = dotcount*stride     # address of first non displayed pixel
+    nrandom = max(0, firstfill - firstrandom)
+    nfill = max(0, dotcount - firstrandom - nrandom)
 
     fill = structures.RGB(0x11, 0, 0)
 
-    a = bytearray(maxlen)
-
-    while offset < minlen1:
-        a[offset:offset+3] = bytearray([
-            random.randrange(256),
-            random.randrange(256),
-            random.randrange(256),
-        ])
-        offset += stride
-
-    while offset < maxdots:
-        a[offset:offset+3] = fill.bytes
-        offset += stride
-
-    return a
+    pixels = random.randbytes(nrandom * 3) + fill.bytes * nfill
+    return preview.build_frame(pixels, dotcount, firstrandom)
 
 
 def subc_testpreview(sock, args):
@@ -125,14 +57,31 @@ def subc_testpreview(sock, args):
     dotcount = int(args.subc_args[0], 0)
     firstrandom = int(args.subc_args[1], 0)
     firstfill = int(args.subc_args[2], 0)
+    if len(args.subc_args) > 3:
+        window = int(args.subc_args[3], 0)
+    else:
+        window = 2
+    if len(args.subc_args) > 4:
+        pacer = scheduler.FrameScheduler(float(args.subc_args[4]))
+    else:
+        pacer = None
 
-    txn_sync_expect(sock, cmd.frame(cmd.CMD_CUSTOM_PREVIEW, None), b'\x31')
+    stream = preview.PreviewStream(
+        sock, window,
+        segment=preview.frame_segment(sock),
+    )
+    stream.start()
 
     for i in range(100):
+        if pacer is not None:
+            pacer.wait()
         a = test_frame(dotcount, firstrandom, firstfill)
-        # TODO - split array up into bits that are MSS rounded down to nearest
-        # 15 byte boundary and hope to solve the MTU issue
-        txn_sync_expect(sock, a, b'\x31')
+        stream.send(a, block=True)
+
+    stream.flush()
+
+    if pacer is not None:
+        print("Pacing: {}".format(pacer.stats()))
 
 
 def subc_brightness(sock, args):
@@ -187,6 +136,27 @@ def subc_mode_change(sock, args):
     txn(sock, cmd.mode_change(mode))
 
 
+def subc_rgb_seq(sock, args):
+    assert (len(args.subc_args) == 1), "command takes 1 arg"
+    order = int(args.subc_args[0], 0)
+    txn(sock, cmd.rgb_seq(order))
+
+
+def subc_scene(sock, args):
+    """Set mode, color, brightness and speed in one go"""
+    assert (len(args.subc_args) == 6), "command takes 6 args"
+    mode, red, green, blue, brightness, speed = [
+        int(x, 0) for x in args.subc_args
+    ]
+
+    connection.Batch(
+        cmd.mode_change(mode),
+        cmd.color(structures.RGB(red, green, blue)),
+        cmd.brightness(brightness),
+        cmd.speed(speed),
+    ).send(sock)
+
+
 def subc_sec_count(sock, args):
     assert (len(args.subc_args) == 1), "command takes 1 arg"
     sec_count = int(args.subc_args[0], 0)
@@ -212,34 +182,19 @@ def subc_status(sock, args):
 
     state = txn_sync(sock, cmd.sync())
     assert_frame(state)
+    status = structures.DeviceStatus.from_bytes(state)
 
-    modenames = {
-        205: 'meteor',
-        206: 'breathing',
-        207: 'stack',
-        208: 'flow',
-        209: 'wave',
-        210: 'flash',
-        211: 'static',
-        212: 'catch-up',
-        219: 'custom_effect',
-        0xfc: 'auto',
-    }
-    if state[2] in modenames:
-        modename = modenames[state[2]]
-    else:
-        modename = ''
-
-    # TODO - move this into the library and object model
-    print("lamp =", state[1])
-    print("mode = {} {}".format(state[2], modename))
-    print("speed =", state[3])
-    print("brightness =", state[4])
-    print("rgb_order =", state[5])
-    print("dotperseg =", state[6]*256 + state[7])
-    print("segs =", state[8]*256 + state[9])
-    print("staticcolor = {}".format(structures.RGB(state[10:13])))
-    print("ic_model =", state[13])
+    modename = cmd.mode_names.get(status.mode, '')
+
+    print("lamp =", status.lamp)
+    print("mode = {} {}".format(status.mode, modename))
+    print("speed =", status.speed)
+    print("brightness =", status.brightness)
+    print("rgb_order =", status.rgb_order)
+    print("dotperseg =", status.dotperseg)
+    print("segs =", status.segs)
+    print("staticcolor = {}".format(status.staticcolor))
+    print("ic_model =", status.ic_model)
 
     assert_status_unknown(state)
 
@@ -285,6 +240,8 @@ subc_cmds = {
     'dot_count':        subc_dot_count,
     'get_device_name':  subc_get_device_name,
     'mode_change':      subc_mode_change,
+    'rgb_seq':          subc_rgb_seq,
+    'scene':            subc_scene,
     'sec_count':        subc_sec_count,
     'set_ic_model':     subc_set_ic_model,
     'speed':   subc_speed,
@@ -298,6 +255,13 @@ def do_options():
     a = argparse.ArgumentParser('Reverse Engineer Protocol for SP108E')
     a.add_argument('-H', '--host', action='store', default='192.168.4.1')
     a.add_argument('-p', '--port', action='store', default='8189')
+    a.add_argument('-q', '--quiet', action='store_true', default=False,
+                   help='Do not print the packets sent and received')
+    a.add_argument('--trace', action='store', default=None,
+                   help='Log the packets to this binary trace file')
+    a.add_argument('--mss', action='store', type=int, default=None,
+                   help='Clamp the TCP MSS down to this (it cannot be '
+                   'raised above what the controller advertises)')
 
     subc = a.add_subparsers(help='Subcommand', dest='cmd')
     subc.required = True
@@ -310,12 +274,20 @@ def do_options():
 
 
 def main(args):
+    if not args.quiet:
+        tracelog.sinks.append(tracelog.PrintSink())
+    if args.trace:
+        tracelog.sinks.append(tracelog.TraceLog(args.trace))
+
     print("Connecting to {}:{}".format(args.host, int(args.port, 0)))
 
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.connect((args.host, int(args.port, 0)))
+    s = connection.connect(args.host, int(args.port, 0), mss=args.mss)
 
-    args.func(s, args)
+    try:
+        args.func(s, args)
+    finally:
+        for sink in tracelog.sinks:
+            sink.close()
 
 
 if __name__ == '__main__':
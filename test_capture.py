@@ -0,0 +1,70 @@
+import pytest
+import capture
+import layout
+import preview
+
+
+def bgrx(width, height, pad=0):
+    """An image like X11 gives on a little endian 24 bit display"""
+    data = bytearray()
+    for y in range(height):
+        for x in range(width):
+            # blue, green, red, unused
+            data += bytes([x, y, 0x80, 0xff])
+        data += bytes(pad)
+    return capture.Image(
+        bytes(data), width, height, width * 4 + pad, 4,
+        0xff0000, 0x00ff00, 0x0000ff, 'little',
+    )
+
+
+def test_channel_offsets():
+    assert capture.channel_offsets(bgrx(1, 1)) == [2, 1, 0]
+
+    image = bgrx(1, 1)._replace(byte_order='big')
+    assert capture.channel_offsets(image) == [1, 2, 3]
+
+    with pytest.raises(ValueError):
+        capture.channel_offsets(image._replace(red_mask=0xf800))
+
+
+def test_to_rgb():
+    assert capture.to_rgb(bgrx(2, 2)) == bytes([
+        0x80, 0, 0, 0x80, 0, 1,
+        0x80, 1, 0, 0x80, 1, 1,
+    ])
+    assert capture.to_rgb(bgrx(2, 2, pad=4)) == capture.to_rgb(bgrx(2, 2))
+
+
+def test_file_pipeline(tmp_path):
+    path = tmp_path / 'test.ppm'
+    path.write_bytes(
+        b'P6\n# a comment\n2 2\n255\n' +
+        b'\x01\x01\x01\x02\x02\x02\x03\x03\x03\x04\x04\x04'
+    )
+
+    source = capture.FileSource([str(path)])
+    assert source.grab().width == 2
+
+    pipeline = capture.Pipeline(source, layout.serpentine(2, 2))
+    frame = pipeline.frame()
+    stride = preview.frame_stride(4)
+    assert [frame[i * stride] for i in range(4)] == [2, 1, 3, 4]
+
+
+def test_bad_ppm(tmp_path):
+    path = tmp_path / 'test.ppm'
+    path.write_bytes(b'P3\n1 1\n255\n0 0 0\n')
+    with pytest.raises(ValueError):
+        capture.read_ppm(str(path))
+
+
+@pytest.mark.parametrize('data', [
+    b'', b'P6', b'P6\n2 2\n', b'P6\n2 2\n255', b'P6 # comment',
+    b'P6\n2 2\n255\n\x01\x02\x03',
+])
+def test_truncated_ppm(tmp_path, data):
+    path = tmp_path / 'test.ppm'
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        capture.read_ppm(str(path))
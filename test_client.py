@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+import client
+import commands
+import metrics
+
+
+async def fake_device(reader, writer):
+    """Just enough of the controller to exercise the client"""
+    while True:
+        packet = await reader.readexactly(6)
+        if packet[4] == commands.CMD_CHECK_DEVICE:
+            challenge = int.from_bytes(packet[1:4], 'little')
+            writer.write(commands.check_device_reply(challenge))
+        elif packet[4] == commands.CMD_GET_DEVICE_NAME:
+            writer.write(b'\x00SP108E_123456')
+
+
+def run_with_devices(count, func):
+    async def run():
+        servers = []
+        clients = []
+        for i in range(count):
+            server = await asyncio.start_server(fake_device, '127.0.0.1', 0)
+            servers.append(server)
+            port = server.sockets[0].getsockname()[1]
+            clients.append(client.SP108EClient('127.0.0.1', port, 0.5))
+
+        try:
+            await client.each(clients, 'connect')
+            return await func(clients)
+        finally:
+            await client.each(clients, 'close')
+            for server in servers:
+                server.close()
+
+    return asyncio.run(run())
+
+
+def test_check_device():
+    async def func(clients):
+        return await client.each(clients, 'check_device', 0x102030)
+
+    assert [0x90] * 5 == run_with_devices(5, func)
+
+
+def test_commands():
+    async def func(clients):
+        device = clients[0]
+        device.metrics = metrics.Metrics()
+        assert await device.command(commands.speed(10)) is None
+        assert 'SP108E_123456' == await device.get_device_name()
+
+        await device.batch(commands.speed(10), commands.brightness(10))
+
+        with pytest.raises(ValueError):
+            await device.batch(commands.sync())
+
+        # no reply at all from the device
+        with pytest.raises(asyncio.TimeoutError):
+            await device.sync()
+
+        assert device.metrics.latency['get_device_name'].count == 1
+        assert device.metrics.latency['check_device'].count == 1
+        assert device.metrics.counters['timeouts'] == 1
+        assert device.metrics.counters['bytes_sent'] == 6 * 6
+
+    run_with_devices(1, func)
+
+
+def test_late_reply():
+    connections = []
+
+    async def slow_device(reader, writer):
+        connections.append(writer)
+        while True:
+            packet = await reader.readexactly(6)
+            if packet[4] == commands.CMD_GET_DEVICE_NAME:
+                await asyncio.sleep(0.2)
+                writer.write(b'\x00SP108E_123456')
+            elif packet[4] == commands.CMD_CHECK_DEVICE:
+                challenge = int.from_bytes(packet[1:4], 'little')
+                writer.write(commands.check_device_reply(challenge))
+
+    async def run():
+        server = await asyncio.start_server(slow_device, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with client.SP108EClient('127.0.0.1', port, 0.1) as device:
+            with pytest.raises(asyncio.TimeoutError):
+                await device.get_device_name()
+            await asyncio.sleep(0.2)
+
+            # the late name reply must not be taken as this answer
+            assert await device.check_device(0x102030) == 0x90
+        server.close()
+        await server.wait_closed()
+        return len(connections)
+
+    assert asyncio.run(run()) == 2
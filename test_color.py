@@ -0,0 +1,43 @@
+import pytest
+import color
+import structures
+
+
+def test_lut():
+    assert color.lut() == bytes(range(256))
+    assert color.lut(brightness=0) == bytes(256)
+
+    table = color.lut(gamma=2.0)
+    assert table[0] == 0
+    assert table[128] == 64
+    assert table[255] == 255
+
+
+def test_pipeline():
+    pixels = b'\x10\x20\x30\xff\x80\x00'
+
+    assert color.ColorPipeline().apply(pixels) == pixels
+    assert color.ColorPipeline(order='GRB').apply(pixels) \
+        == b'\x20\x10\x30\x80\xff\x00'
+    assert color.ColorPipeline(order=5).apply(memoryview(pixels)) \
+        == b'\x30\x20\x10\x00\x80\xff'
+
+    dim = color.ColorPipeline(brightness=128, order='BGR')
+    assert dim.apply(pixels) == b'\x18\x10\x08\x00\x40\x80'
+
+    with pytest.raises(ValueError):
+        color.ColorPipeline(order='RRG')
+    with pytest.raises(ValueError):
+        color.ColorPipeline(brightness=256)
+    with pytest.raises(ValueError):
+        color.ColorPipeline(order=6)
+    with pytest.raises(ValueError):
+        color.ColorPipeline(order=-1)
+
+
+def test_rgb_orders():
+    # the captured status in notes.txt, from a WS2812 strip
+    status = structures.DeviceStatus.from_bytes(
+        bytes.fromhex('3801fc80ff0200320001ff00000300ff83')
+    )
+    assert color.RGB_ORDERS[status.rgb_order] == 'GRB'
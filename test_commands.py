@@ -28,6 +28,14 @@ def test_check_device():
     assert b'\x38\x30\x20\x10\xd5\x83' == commands.check_device(0x102030)
 
 
+def test_check_device_reply():
+    # Values sniffed from the app, see notes.txt
+    assert b'\x01\x02\x03\x04\x05\xf7' \
+        == commands.check_device_reply(0x9a6c53)
+    assert b'\x01\x02\x03\x04\x05\xcf' \
+        == commands.check_device_reply(0xd323e5)
+
+
 def test_mode_change():
     assert b'\x38\x00\x00\x00\x06\x83' \
         == commands.mode_change(commands.MODE_AUTO)
@@ -49,6 +57,10 @@ def test_color():
     assert b'\x38\x10\x20\x30\x22\x83' == commands.color(rgb)
 
 
+def test_rgb_seq():
+    assert b'\x38\x02\x00\x00\x3c\x83' == commands.rgb_seq(2)
+
+
 def test_brightness():
     assert b'\x38\x45\x00\x00\x2a\x83' == commands.brightness(0x45)
 
@@ -59,3 +71,24 @@ def test_dot_count():
 
 def test_sec_count():
     assert b'\x38\x06\x00\x00\x2e\x83' == commands.sec_count(6)
+
+
+def test_frame_into():
+    buf = bytearray(b'\xff' * 14)
+    assert 7 == commands.frame_into(buf, 1, 0x7f, None)
+    assert 13 == commands.frame_into(buf, 7, 0xf, b'\x80')
+    assert buf == b'\xff\x38\x00\x00\x00\x7f\x83\x38\x80\x00\x00\x0f\x83\xff'
+
+    with pytest.raises(ValueError):
+        commands.frame_into(buf, 0, 4, b'\x01\x02\x03\x04')
+
+
+def test_packet_cache():
+    for value in (0, 1, 0x80, 0xff):
+        assert commands.frame(commands.CMD_BRIGHTNESS, bytes([value])) \
+            == commands.brightness(value)
+
+    with pytest.raises(ValueError):
+        commands.speed(256)
+    with pytest.raises(ValueError):
+        commands.speed(-1)
@@ -0,0 +1,45 @@
+import socket
+
+import pytest
+import commands
+import connection
+
+
+def test_cmd_check_device(socks):
+    sock, peer = socks
+    peer.sendall(commands.check_device_reply(0x102030))
+    assert 0x90 == connection.cmd_check_device(sock, 0x102030)
+    assert commands.check_device(0x102030) == peer.recv(4096)
+
+
+def test_batch(socks):
+    sock, peer = socks
+
+    batch = connection.Batch(commands.brightness(0x45))
+    batch.add(commands.speed(100))
+    assert len(batch) == 2
+
+    with pytest.raises(ValueError):
+        batch.add(commands.sync())
+    with pytest.raises(ValueError):
+        batch.add(b'\x38\x00')
+
+    peer.sendall(commands.check_device_reply(0x73a52b))
+    batch.send(sock)
+    assert len(batch) == 0
+    assert peer.recv(4096) == (
+        commands.brightness(0x45) +
+        commands.speed(100) +
+        commands.check_device(0x73a52b)
+    )
+
+
+def test_connect():
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+
+    sock = connection.connect(*server.getsockname(), timeout=1, mss=960)
+    assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+    sock.close()
+    server.close()
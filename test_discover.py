@@ -0,0 +1,30 @@
+import discover
+import emulator
+
+
+def test_discover(tmp_path):
+    with emulator.Emulator() as device:
+        port = device.server_address[1]
+        cache = discover.Cache(str(tmp_path / 'cache.json'))
+
+        found = discover.discover('127.0.0.0/30', port, cache=cache)
+        assert found == {'127.0.0.1': 'SP108E_emulator'}
+
+    # The device has gone, but the cached results are still fresh
+    assert discover.discover('127.0.0.0/30', port, cache=cache) == found
+    assert discover.discover(
+        '127.0.0.0/30', port, cache=cache, refresh=True
+    ) == {}
+
+
+def test_cache_ttl(tmp_path):
+    now = [1000]
+    cache = discover.Cache(
+        str(tmp_path / 'new' / 'cache.json'), ttl=10, clock=lambda: now[0]
+    )
+    assert cache.get('net') is None
+
+    cache.put('net', {'10.0.0.1': 'name'})
+    assert cache.get('net') == {'10.0.0.1': 'name'}
+    now[0] += 11
+    assert cache.get('net') is None
@@ -0,0 +1,123 @@
+import time
+
+import pytest
+import commands
+import connection
+import emulator
+import preview
+import structures
+
+
+@pytest.fixture
+def device():
+    with emulator.Emulator(seed=1) as server:
+        yield server
+
+
+def connect(server):
+    return connection.connect(*server.server_address, timeout=1)
+
+
+def test_commands(device):
+    sock = connect(device)
+    assert connection.cmd_check_device(sock, 0x102030) == 0x90
+
+    status = structures.DeviceStatus.from_bytes(
+        connection.txn_sync(sock, commands.sync())
+    )
+    assert status == emulator.DEFAULT_STATUS
+
+    connection.Batch(
+        commands.brightness(0x10),
+        commands.mode_change(commands.MODE_STATIC),
+        commands.color(structures.RGB(1, 2, 3)),
+        commands.dot_count(0x123),
+    ).send(sock)
+    assert device.status.brightness == 0x10
+    assert device.status.mode == commands.MODE_STATIC
+    assert device.status.color == b'\x01\x02\x03'
+    assert device.status.dotperseg == 0x123
+
+    assert connection.txn_sync(sock, commands.get_device_name()) \
+        == b'\x00SP108E_emulator'
+    sock.close()
+
+
+def test_preview(device):
+    sock = connect(device)
+    stream = preview.PreviewStream(sock, window=4, keepalive=0)
+    stream.start()
+    for i in range(10):
+        stream.send(bytes([i]) * preview.FRAME_SIZE, block=True)
+    stream.flush()
+
+    assert device.frames == 10
+    assert device.frame == bytes([9]) * preview.FRAME_SIZE
+    assert device.status.mode == 0
+    sock.close()
+
+
+def test_drop_acks():
+    with emulator.Emulator(drop_acks=1.0) as device:
+        sock = connect(device)
+        stream = preview.PreviewStream(sock, timeout=0.05)
+        stream.start()
+        stream.send(bytes(preview.FRAME_SIZE))
+        with pytest.raises(TimeoutError):
+            stream.flush()
+        assert device.dropped_acks == 1
+        sock.close()
+
+
+def test_drop_some_acks():
+    with emulator.Emulator(drop_acks=0.3, seed=1) as device:
+        sock = connect(device)
+        stream = preview.PreviewStream(
+            sock, window=1, timeout=0.05, keepalive=0
+        )
+        stream.start()
+        for i in range(20):
+            try:
+                stream.send(bytes([i]) * preview.FRAME_SIZE, block=True)
+            except TimeoutError:
+                pass
+        try:
+            stream.flush()
+        except TimeoutError:
+            pass
+
+        # each lost ack costs one timeout, then the stream carries on
+        assert device.dropped_acks > 0
+        assert stream.lost == device.dropped_acks
+        assert stream.sent + device.dropped_acks == 20
+        assert device.frames == stream.sent
+        sock.close()
+
+
+def test_latency():
+    with emulator.Emulator(latency=0.05) as device:
+        sock = connect(device)
+        start = time.monotonic()
+        connection.cmd_check_device(sock, None)
+        assert time.monotonic() - start >= 0.05
+        sock.close()
+
+
+def test_pipelined_not_split():
+    with emulator.Emulator(split_corrupts=True) as device:
+        sock = connect(device)
+        stream = preview.PreviewStream(sock, window=8, keepalive=0)
+        stream.start()
+        for i in range(200):
+            stream.send(bytes([i]) * preview.FRAME_SIZE, block=True)
+        stream.flush()
+        assert device.frames == 200
+        assert device.corrupt_frames == 0
+        sock.close()
+
+
+def test_mss():
+    with emulator.Emulator(mss=576) as device:
+        sock = connect(device)
+        assert preview.frame_segment(sock) is not None
+        sock.close()
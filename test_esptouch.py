@@ -0,0 +1,136 @@
+import socket
+import struct
+
+import pytest
+import esptouch
+
+SYNC_LOWEST = 0x200
+
+# The example from notes.txt, with the total xor byte corrected
+CONFIG = bytes.fromhex(
+    '1b0c2916fec0a801bf616161616262626263636363' '5a5a5a5a5a5a'
+)
+
+
+def udp_packet(ip_dest, length):
+    """An ethernet frame carrying a UDP packet with a payload of length"""
+    return (
+        bytes(12) + b'\x08\x00' +
+        b'\x45' + bytes(8) + b'\x11' + bytes(6) +
+        bytes([234, ip_dest, ip_dest, ip_dest]) +
+        struct.pack('!HH', 50000, esptouch.PORT) + bytes(4) +
+        bytes(length)
+    )
+
+
+def write_pcap(path, lengths):
+    """Save a capture of packets with the given (ip_dest, length)"""
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for i, (ip_dest, length) in enumerate(lengths):
+            packet = udp_packet(ip_dest, length)
+            f.write(struct.pack('<IIII', i, 0, len(packet), len(packet)))
+            f.write(packet)
+
+
+def config_lengths(config):
+    """One sync group then one copy of the data triplets"""
+    lengths = []
+    for group, length in esptouch.schedule(config, 0, 0):
+        if len(lengths) == 4 + 3 * len(config):
+            return lengths
+        lengths.append((group % 100 + 1, length))
+
+
+def test_decode_file(tmp_path):
+    path = str(tmp_path / 'test.pcap')
+    write_pcap(path, config_lengths(CONFIG))
+
+    with open(path, 'rb') as f:
+        packets = list(esptouch.read_pcap(f))
+    assert len(packets) == 4 + 3 * len(CONFIG)
+
+    log, decoder = esptouch.decode_file(path)
+    assert log == []
+    assert decoder.decode() == CONFIG
+
+    config = esptouch.parse_config(decoder.decode())
+    assert config['psk'] == b'aaaabbbbcccc'
+    assert config['ssid'] == b'ZZZZZZ'
+    assert config['ip'] == '192.168.1.191'
+
+    results = list(esptouch.decode_files([path, path], workers=2))
+    assert [r[1].decode() for r in results] == [CONFIG, CONFIG]
+
+
+def test_decoder_errors():
+    decoder = esptouch.Decoder()
+    assert decoder.feed(0, 1, 0x202) == '0.000 01 202 SYNC bad start'
+    assert decoder.feed(0, 1, 0x200) == '0.000 01 200 SYNC detected missing'
+    assert decoder.feed(1, 1, 0x30) is None
+    assert decoder.feed(1, 2, 0x129) == '1.000 02 129 TRIPLE bad'
+    assert decoder.feed(2, 3, 0x38) is None
+    assert decoder.feed(2, 3, 0x128) is None
+    assert decoder.feed(2, 3, 0x28) == '2.000 03 128 TRIPLE bad crc'
+
+    with pytest.raises(ValueError):
+        esptouch.parse_config(CONFIG[:-1])
+    with pytest.raises(ValueError):
+        esptouch.parse_config(CONFIG[:-1] + b'\x00')
+
+
+def test_crc8():
+    assert esptouch.crc8(b'123456789') == 0xa1
+
+
+def test_encode():
+    config = esptouch.encode_config(
+        'ZZZZZZ', 'aaaabbbbcccc', '192.168.1.191',
+        bssid=b'\x00\x11\x22\x33\x44\x55',
+    )
+    assert config[0] == len(config) == 27
+    assert config[5:9] == b'\xc0\xa8\x01\xbf'
+
+    parsed = esptouch.parse_config(config)
+    assert parsed['ssid'] == b'ZZZZZZ'
+    assert parsed['bssid_crc'] == esptouch.crc8(b'\x00\x11\x22\x33\x44\x55')
+
+    for d0, counter, d2 in esptouch.encode_data(config):
+        assert esptouch.triplet_crc_ok(d0, counter, d2)
+        assert d0 < SYNC_LOWEST and d2 < SYNC_LOWEST
+
+    with pytest.raises(ValueError):
+        esptouch.encode_config('x' * 200, 'y' * 100, '10.0.0.1')
+
+
+def test_round_trip(tmp_path):
+    # includes spaces and the full range of byte values
+    config = esptouch.encode_config(
+        'my wifi', bytes(range(1, 0x100, 7)), '10.1.2.3'
+    )
+    path = str(tmp_path / 'test.pcap')
+    write_pcap(path, config_lengths(config))
+
+    log, decoder = esptouch.decode_file(path)
+    assert log == []
+    assert esptouch.parse_config(decoder.decode()) \
+        == esptouch.parse_config(config)
+
+
+def test_sender(clock):
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(1)
+
+    with esptouch.Sender(
+        port=receiver.getsockname()[1],
+        address=lambda group: '127.0.0.1',
+        clock=clock,
+        sleep=clock.sleep,
+    ) as sender:
+        stats = sender.send(CONFIG, duration=0.1)
+    assert sender.sent == stats['frames'] == 14
+    assert sender.sock.fileno() == -1
+    assert [len(receiver.recv(1024)) for i in range(5)] \
+        == [0x203, 0x202, 0x201, 0x200, 0x203]
+    receiver.close()
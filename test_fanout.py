@@ -0,0 +1,107 @@
+import socket
+
+import pytest
+import emulator
+import fanout
+import layout
+import preview
+
+
+@pytest.fixture
+def devices():
+    servers = [emulator.Emulator().start() for i in range(3)]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def test_controller():
+    c = fanout.Controller('localhost', offset=1, dotcount=2)
+    frame = c.frame(b'\x00\x00\x00\x01\x01\x01\x02\x02\x02\x03\x03\x03')
+    assert frame[0:3] == b'\x01\x01\x01'
+    assert frame[450:453] == b'\x02\x02\x02'
+
+    c = fanout.Controller('localhost', mapping=layout.Layout([1, 0]))
+    assert c.count == 2
+    assert c.dotcount == 2
+    assert c.frame(b'\x01\x01\x01\x02\x02\x02')[0:3] == b'\x02\x02\x02'
+
+    with pytest.raises(ValueError):
+        fanout.Controller('localhost')
+
+
+def test_fanout(devices):
+    controllers = [
+        fanout.Controller(*server.server_address, offset=i * 10, dotcount=10)
+        for i, server in enumerate(devices)
+    ]
+    canvas = bytearray()
+    for i in range(30):
+        canvas += bytes([i, i, i])
+
+    with fanout.FanOut(controllers) as f:
+        assert f.send(canvas, block=True) == [True] * 3
+        f.flush()
+
+    for i, server in enumerate(devices):
+        stride = preview.frame_stride(10)
+        assert server.frame[0] == i * 10
+        assert server.frame[9 * stride] == i * 10 + 9
+    assert f.frames == 1
+    assert f.skew >= 0
+
+
+def test_aligned():
+    # the delay is split evenly each way, as the alignment assumes
+    servers = [
+        emulator.Emulator(latency=0.0005, inbound=0.0005).start(),
+        emulator.Emulator(latency=0.02, inbound=0.02).start(),
+    ]
+    try:
+        for aligned in (False, True):
+            controllers = [
+                fanout.Controller(*server.server_address, dotcount=10)
+                for server in servers
+            ]
+            with fanout.FanOut(controllers, aligned=aligned) as f:
+                assert controllers[1].rtt >= 0.04
+                assert controllers[0].rtt < controllers[1].rtt
+
+                f.send(bytes(30), block=True)
+                f.flush()
+            assert len(f.skews) == 1
+
+            # compare when the devices displayed the frame
+            shown = [server.frame_times[-1] for server in servers]
+            skew = abs(shown[1] - shown[0])
+            if aligned:
+                # the fast controller was held back by half the difference
+                assert skew < 0.01
+                assert f.skew < 0.01
+            else:
+                assert skew > 0.015
+                assert f.skew > 0.015
+    finally:
+        for server in servers:
+            server.stop()
+
+
+def test_connect_failure(devices):
+    # grab an unused port number
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+
+    controllers = [
+        fanout.Controller(*server.server_address, dotcount=10)
+        for server in devices
+    ]
+    controllers.append(fanout.Controller('127.0.0.1', port, dotcount=10))
+
+    f = fanout.FanOut(controllers)
+    with pytest.raises(ConnectionError):
+        f.connect()
+    assert all(controller.sock is None for controller in controllers)
+    with pytest.raises(RuntimeError):
+        f.executor.submit(int)
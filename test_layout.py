@@ -0,0 +1,41 @@
+import pytest
+import layout
+
+
+def test_gather():
+    mapping = layout.Layout([2, 0])
+    assert len(mapping) == 2
+    assert mapping.gather(b'\x00\x01\x02\x10\x11\x12\x20\x21\x22') \
+        == b'\x20\x21\x22\x00\x01\x02'
+
+    with pytest.raises(ValueError):
+        layout.Layout([])
+
+
+def test_serpentine():
+    assert layout.serpentine(3, 3).indices == (2, 1, 0, 3, 4, 5, 8, 7, 6)
+
+
+def test_grid():
+    # 0 1 2
+    # 3 4 5
+    assert layout.grid(3, 2).indices == (0, 1, 2, 3, 4, 5)
+    assert layout.grid(3, 2, serpentine=True).indices == (0, 1, 2, 5, 4, 3)
+    assert layout.grid(3, 2, mirror=True).indices == (2, 1, 0, 5, 4, 3)
+    assert layout.grid(3, 2, rotation=90).indices == (3, 0, 4, 1, 5, 2)
+    assert layout.grid(3, 2, rotation=180).indices == (5, 4, 3, 2, 1, 0)
+    assert layout.grid(3, 2, rotation=270).indices == (2, 5, 1, 4, 0, 3)
+
+    with pytest.raises(ValueError):
+        layout.grid(3, 2, rotation=45)
+
+
+def test_compile(tmp_path):
+    assert layout.compile({'segments': 2, 'dots': 3}).indices \
+        == layout.grid(3, 2).indices
+    assert layout.compile({'width': 3, 'height': 3, 'serpentine': True}) \
+        .indices == (0, 1, 2, 5, 4, 3, 6, 7, 8)
+
+    path = tmp_path / 'map.txt'
+    path.write_text('# a test map\n3, 1\n0x2 0 # comment\n')
+    assert layout.compile({'file': str(path)}).indices == (3, 1, 2, 0)
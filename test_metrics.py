@@ -0,0 +1,69 @@
+import pytest
+import commands
+import metrics
+import preview
+
+
+def test_metrics(clock):
+    m = metrics.Metrics('test', window=20, clock=clock)
+
+    m.observe(commands.CMD_SYNC, 0.003)
+    m.observe(commands.CMD_SYNC, 0.5)
+    m.observe('preview', 5)
+    m.count('frames_sent', 20)
+    clock.now = 10
+
+    snapshot = m.snapshot()
+    assert snapshot['fps'] == 2.0
+    assert snapshot['counters'] == {'frames_sent': 20}
+    sync = snapshot['latency']['sync']
+    assert sync['count'] == 2
+    assert sync['buckets'][0.005] == 1
+    assert sync['buckets'][0.5] == 1
+
+    text = m.text()
+    assert 'sp108e_frames_sent_total{controller="test"} 20\n' in text
+    assert 'sp108e_latency_seconds_bucket{controller="test",' \
+        'command="sync",le="0.01"} 1\n' in text
+    assert 'sp108e_latency_seconds_bucket{controller="test",' \
+        'command="sync",le="+Inf"} 2\n' in text
+    assert 'command="preview",le="2.0"} 0\n' in text
+    assert 'command="preview",le="+Inf"} 1\n' in text
+
+
+def test_fps_window(clock):
+    m = metrics.Metrics(window=5, clock=clock)
+    for i in range(100):
+        m.count('frames_sent')
+        clock.now += 0.1
+    assert m.fps() == pytest.approx(10, abs=0.3)
+
+    # the rate drops to the new one, not towards the lifetime average
+    for i in range(100):
+        m.count('frames_sent')
+        clock.now += 0.5
+    assert m.fps() == pytest.approx(2, abs=0.3)
+    assert len(m.frame_times) <= 11
+
+    clock.now += 10
+    assert m.fps() == 0.0
+
+
+def test_preview_metrics(socks, clock):
+    sock, peer = socks
+    m = metrics.Metrics(clock=clock)
+    stream = preview.PreviewStream(sock, window=1, metrics=m, clock=clock)
+
+    stream.send(bytes(preview.FRAME_SIZE))
+    stream.send(bytes([1]) * preview.FRAME_SIZE)
+    stream.send(bytes([2]) * preview.FRAME_SIZE)
+    clock.now = 0.05
+    peer.sendall(preview.ACK)
+    stream.send(bytes([3]) * preview.FRAME_SIZE, block=True)
+    peer.sendall(preview.ACK)
+    stream.flush()
+
+    assert m.counters['frames_sent'] == 2
+    assert m.counters['frames_dropped'] == 2
+    assert m.counters['bytes_sent'] == 2 * preview.FRAME_SIZE
+    assert m.latency['preview'].count == 2
@@ -0,0 +1,84 @@
+import socket
+import socketserver
+import threading
+
+import pytest
+import commands
+import pool
+
+
+class FakeDevice(socketserver.BaseRequestHandler):
+    """Answer check_device packets, hanging up on anything else"""
+
+    def handle(self):
+        while True:
+            packet = self.request.recv(6)
+            if len(packet) != 6 or packet[4] != commands.CMD_CHECK_DEVICE:
+                return
+            challenge = int.from_bytes(packet[1:4], 'little')
+            self.request.sendall(commands.check_device_reply(challenge))
+
+
+@pytest.fixture
+def device():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeDevice)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_reuse_and_check(device, clock):
+    host, port = device.server_address
+
+    with pool.ConnectionPool(check_interval=10, clock=clock) as p:
+        sock = p.get(host, port)
+        assert sock is p.get(host, port)
+
+        # idle, so it is checked, but still good
+        clock.now = 20
+        assert sock is p.get(host, port)
+
+        # make the device hang up, so the check fails and we reconnect
+        sock.sendall(commands.sync())
+        clock.now = 40
+        assert sock is not p.get(host, port)
+
+
+def test_call_reconnects(device):
+    host, port = device.server_address
+
+    def check(sock):
+        sock.sendall(commands.check_device(0x102030))
+        r = sock.recv(4096)
+        if not r:
+            raise ConnectionResetError()
+        return r
+
+    with pool.ConnectionPool() as p:
+        assert p.call(host, port, check)[5] == 0x90
+
+        sock = p.get(host, port)
+        sock.sendall(commands.sync())
+        assert p.call(host, port, check)[5] == 0x90
+        assert sock is not p.get(host, port)
+
+
+def test_backoff():
+    delays = []
+    p = pool.ConnectionPool(timeout=0.1, retries=4, sleep=delays.append)
+
+    # grab an unused port number
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+
+    with pytest.raises(OSError):
+        p.get('127.0.0.1', port)
+    assert delays == [0.1, 0.2, 0.4]
+
+    with pytest.raises(ValueError):
+        pool.ConnectionPool(retries=0)
@@ -0,0 +1,250 @@
+import socket
+import threading
+
+import pytest
+import connection
+import emulator
+import preview
+import structures
+
+
+def recv_exactly(sock, size):
+    buf = b''
+    while len(buf) < size:
+        buf += sock.recv(size - len(buf))
+    return buf
+
+
+def ack_frames(sock, count):
+    """Behave like the controller, acking each frame as it arrives"""
+    def run():
+        frames = []
+        for i in range(count):
+            frames.append(recv_exactly(sock, preview.FRAME_SIZE))
+            sock.sendall(preview.ACK)
+        thread.frames = frames
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_start(socks):
+    sock, peer = socks
+    peer.sendall(preview.ACK)
+    preview.PreviewStream(sock).start()
+    assert b'\x38\x00\x00\x00\x24\x83' == recv_exactly(peer, 6)
+
+
+def test_window(socks):
+    sock, peer = socks
+    stream = preview.PreviewStream(sock, window=2, keepalive=0)
+    frame1 = bytes([1]) * preview.FRAME_SIZE
+    frame2 = bytes([2]) * preview.FRAME_SIZE
+    frame3 = bytes([3]) * preview.FRAME_SIZE
+
+    assert stream.send(frame1)
+    assert stream.send(frame1)
+    assert stream.inflight == 2
+
+    # window is full, so frames are coalesced into the pending slot
+    assert not stream.send(frame2)
+    assert not stream.send(frame3)
+    assert stream.dropped == 1
+    assert stream.pending == frame3
+
+    peer_thread = ack_frames(peer, 3)
+    stream.flush()
+    peer_thread.join()
+    assert stream.inflight == 0
+    assert stream.pending is None
+    assert stream.sent == 3
+    assert peer_thread.frames == [frame1, frame1, frame3]
+
+
+def test_block(socks):
+    sock, peer = socks
+    stream = preview.PreviewStream(sock, window=1, keepalive=0)
+    frame = bytes(preview.FRAME_SIZE)
+
+    assert stream.send(frame)
+    peer.sendall(preview.ACK)
+    assert stream.send(frame, block=True)
+    assert stream.dropped == 0
+
+    with pytest.raises(ValueError):
+        peer.sendall(b'\x00')
+        stream.send(frame, block=True)
+
+
+def test_unchanged(socks, clock):
+    sock, peer = socks
+    stream = preview.PreviewStream(sock, window=1, clock=clock)
+    frame1 = bytes([1]) * preview.FRAME_SIZE
+    frame2 = bytes([2]) * preview.FRAME_SIZE
+
+    assert stream.send(frame1)
+    assert not stream.send(frame1)
+    assert stream.unchanged == 1
+
+    # a changed frame queues as pending, then goes stale
+    assert not stream.send(frame2)
+    assert not stream.send(frame2)
+    assert not stream.send(frame1)
+    assert stream.pending is None
+    assert stream.unchanged == 3
+    assert stream.dropped == 1
+
+    # keepalive is due, so the same frame is sent again
+    peer.sendall(preview.ACK)
+    clock.now = 2.0
+    assert stream.send(frame1, block=True)
+    assert stream.sent == 2
+
+
+def test_pending_resent(socks, clock):
+    sock, peer = socks
+    stream = preview.PreviewStream(sock, window=1, clock=clock)
+    frame1 = bytes([1]) * preview.FRAME_SIZE
+    frame2 = bytes([2]) * preview.FRAME_SIZE
+
+    assert stream.send(frame1)
+    assert not stream.send(frame2)
+    assert stream.pending == frame2
+
+    # once acked, the same frame again is the pending one going out
+    peer.sendall(preview.ACK)
+    assert stream.send(frame2)
+    assert stream.pending is None
+    assert stream.sent == 2
+    assert stream.dropped == 0
+    assert stream.unchanged == 0
+
+    # with the keepalive due, the shown frame replaces a pending one
+    frame3 = bytes([3]) * preview.FRAME_SIZE
+    assert not stream.send(frame3)
+    clock.now = 2.0
+    assert not stream.send(frame2)
+    assert stream.pending == frame2
+    assert stream.dropped == 1
+
+    peer.sendall(preview.ACK)
+    assert stream.send(frame2)
+    assert stream.sent == 3
+    frames = [recv_exactly(peer, preview.FRAME_SIZE) for i in range(3)]
+    assert frames == [frame1, frame2, frame2]
+
+
+def test_timeout(socks):
+    sock, peer = socks
+    stream = preview.PreviewStream(sock, window=1, timeout=0.01)
+    stream.send(bytes(preview.FRAME_SIZE))
+    with pytest.raises(TimeoutError):
+        stream.flush()
+    assert stream.lost == 1
+    assert stream.inflight == 0
+
+    # the written off frame's ack turns up late, and is not miscounted
+    peer.sendall(preview.ACK)
+    assert stream.send(bytes([1]) * preview.FRAME_SIZE, block=True)
+    assert stream.inflight == 1
+    peer.sendall(preview.ACK)
+    stream.flush()
+    assert stream.inflight == 0
+    assert stream.sent == 2
+
+
+def test_frame_stride():
+    assert preview.frame_stride(3) == 300
+    assert preview.frame_stride(4) == 225
+    assert preview.frame_stride(300) == 3
+
+    with pytest.raises(ValueError):
+        preview.frame_stride(301)
+    with pytest.raises(ValueError):
+        preview.frame_stride(0)
+
+
+def test_build_frame():
+    frame = preview.build_frame(b'\x01\x02\x03\x04\x05\x06', 4)
+    assert len(frame) == preview.FRAME_SIZE
+    assert frame[0:3] == b'\x01\x02\x03'
+    assert frame[225:228] == b'\x04\x05\x06'
+    assert frame.count(0) == preview.FRAME_SIZE - 6
+
+    frame = preview.build_frame(b'\x07\x08\x09', 4, start=3, buf=frame)
+    assert frame[0:3] == b'\x01\x02\x03'
+    assert frame[675:678] == b'\x07\x08\x09'
+
+    pixels = structures.PixelBuffer(2)
+    pixels.fill(b'\x11\x22\x33')
+    frame = preview.build_frame(pixels, 3)
+    assert frame[300:303] == b'\x11\x22\x33'
+
+    frame = preview.build_frame(bytes(range(30)) * 30, 300)
+    assert frame == bytes(range(30)) * 30
+
+    with pytest.raises(ValueError):
+        preview.build_frame(b'\x01\x02', 4)
+    with pytest.raises(ValueError):
+        preview.build_frame(bytes(15), 4)
+
+
+def test_segment_size():
+    assert preview.segment_size(576) == 570
+    assert preview.segment_size(536) == 525
+    with pytest.raises(ValueError):
+        preview.segment_size(14)
+
+
+def test_segmented(socks):
+    sock, peer = socks
+    stream = preview.PreviewStream(sock, segment=preview.segment_size(576))
+    frame = bytes(range(225)) * 4
+
+    peer_thread = ack_frames(peer, 1)
+    stream.send(frame)
+    stream.flush()
+    peer_thread.join()
+    assert peer_thread.frames == [frame]
+
+
+class RecordingSocket(object):
+    """Pass everything through to sock, noting the size of each write"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.writes = []
+
+    def sendall(self, data):
+        self.writes.append(len(data))
+        self.sock.sendall(data)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+def test_negotiated_segments():
+    with emulator.Emulator(mss=576) as device:
+        # asking for more than the controller advertises gets nothing
+        for mss in (None, 960, 1400, 300):
+            sock = connection.connect(*device.server_address, timeout=1,
+                                      mss=mss)
+            negotiated = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_MAXSEG)
+            assert negotiated <= min(mss or 576, 576)
+
+            segment = preview.frame_segment(sock)
+            assert segment == preview.segment_size(negotiated)
+
+            recorder = RecordingSocket(sock)
+            stream = preview.PreviewStream(recorder, segment=segment)
+            stream.start()
+            recorder.writes.clear()
+            frame = bytes(range(225)) * 4
+            stream.send(frame, block=True)
+            stream.flush()
+            assert device.frame == frame
+            assert sum(recorder.writes) == preview.FRAME_SIZE
+            assert all(size <= negotiated for size in recorder.writes)
+            assert all(size % 15 == 0 for size in recorder.writes)
+            sock.close()
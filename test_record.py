@@ -0,0 +1,112 @@
+import os
+
+import pytest
+import emulator
+import preview
+import record
+from connection import connect
+
+
+def frames():
+    a = bytearray(preview.FRAME_SIZE)
+    yield 0.0, bytes(a)
+    a[10:13] = b'\x01\x02\x03'
+    yield 0.25, bytes(a)
+    yield 0.5, bytes(a)
+    a[0] = 0xff
+    a[-1] = 0xff
+    yield 0.75, bytes(a)
+
+
+def test_changed_span():
+    assert record.changed_span(b'\x00\x00\x00', b'\x00\x00\x00') is None
+    assert record.changed_span(b'\x00\x00\x00', b'\x00\x01\x00') == (1, 2)
+    assert record.changed_span(b'\x00\x00\x00', b'\x01\x00\x01') == (0, 3)
+    assert record.changed_span(b'\x00\x00\x01', b'\x00\x00\x00') == (2, 3)
+
+
+@pytest.mark.parametrize('delta', [True, False])
+def test_round_trip(tmp_path, delta):
+    path = str(tmp_path / 'show.rec')
+    with record.Recorder(path, delta=delta) as recorder:
+        for when, frame in frames():
+            recorder.write(frame, 100 + when)
+
+    size = os.path.getsize(path)
+    if delta:
+        # a full frame, a three byte span, a repeat and a full span
+        assert size < 3 * preview.FRAME_SIZE
+    else:
+        assert size > 4 * preview.FRAME_SIZE
+
+    with record.Player(path) as player:
+        played = [(when, bytes(frame)) for when, frame in player]
+    assert played == list(frames())
+
+    with record.Recorder(str(tmp_path / 'short.rec')) as recorder:
+        with pytest.raises(ValueError):
+            recorder.write(b'\x00')
+
+
+def test_replay(tmp_path, clock):
+    path = str(tmp_path / 'show.rec')
+    with record.Recorder(path) as recorder:
+        for when, frame in frames():
+            recorder.write(frame, when)
+
+    servers = [emulator.Emulator().start() for i in range(2)]
+    streams = []
+    for server in servers:
+        stream = preview.PreviewStream(
+            connect(*server.server_address, timeout=1), window=4
+        )
+        stream.start()
+        streams.append(stream)
+
+    with record.Player(path) as player:
+        assert record.replay(
+            player, streams, speed=2.0, clock=clock, sleep=clock.sleep
+        ) == 4
+    assert clock.slept == [0.125, 0.125, 0.125]
+
+    for stream, server in zip(streams, servers):
+        stream.sock.close()
+        # the repeated frame is skipped as unchanged
+        assert server.frames == 3
+        assert server.frame == list(frames())[-1][1]
+        server.stop()
+
+
+def test_bad_file(tmp_path):
+    path = tmp_path / 'bad.rec'
+    for data in (b'not a recording', b'', record.MAGIC):
+        path.write_bytes(data)
+        with pytest.raises(ValueError):
+            record.Player(str(path))
+
+
+@pytest.mark.parametrize('cut', [1, 100, preview.FRAME_SIZE + 10])
+def test_truncated(tmp_path, cut):
+    path = tmp_path / 'show.rec'
+    with record.Recorder(str(path), delta=False) as recorder:
+        for when, frame in frames():
+            recorder.write(frame, when)
+    path.write_bytes(path.read_bytes()[:-cut])
+
+    played = []
+    with record.Player(str(path)) as player:
+        with pytest.raises(ValueError):
+            for when, frame in player:
+                played.append(len(frame))
+    assert played == [preview.FRAME_SIZE] * len(played)
+
+
+def test_bad_span(tmp_path):
+    path = tmp_path / 'bad.rec'
+    path.write_bytes(
+        record._header.pack(record.MAGIC, 4) +
+        record._record.pack(0.0, record.SPAN, 2, 4) + b'\x01\x02\x03\x04'
+    )
+    with record.Player(str(path)) as player:
+        with pytest.raises(ValueError):
+            list(player)
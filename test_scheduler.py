@@ -0,0 +1,50 @@
+import pytest
+import scheduler
+
+
+def test_pacing(clock):
+    s = scheduler.FrameScheduler(10, clock=clock, sleep=clock.sleep)
+
+    assert s.wait() == 0
+    clock.now += 0.03
+    assert s.wait() == 0
+    assert s.wait() == 0
+    assert clock.slept == [0.07, 0.1]
+    assert clock.now == pytest.approx(0.2)
+
+
+def test_drop_late(clock):
+    s = scheduler.FrameScheduler(10, clock=clock, sleep=clock.sleep)
+
+    s.wait()
+    # took 3.5 frames to render, so two deadlines are lost
+    clock.now += 0.35
+    assert s.wait() == 2
+    assert clock.slept == []
+
+    # back on the original schedule
+    assert s.wait() == 0
+    assert clock.slept == [0.05]
+
+    stats = s.stats()
+    assert stats['frames'] == 3
+    assert stats['dropped'] == 2
+    assert stats['late_max'] == pytest.approx(0.05)
+
+
+def test_jitter(clock):
+    s = scheduler.FrameScheduler(10, clock=clock, sleep=lambda d: None)
+
+    s.wait()
+    clock.now += 0.12
+    s.wait()
+    clock.now += 0.08
+    s.wait()
+
+    stats = s.stats()
+    assert stats['late_mean'] == pytest.approx(0.02 / 3)
+    assert stats['late_max'] == pytest.approx(0.02)
+    assert stats['jitter'] > 0
+
+    with pytest.raises(ValueError):
+        scheduler.FrameScheduler(0)
@@ -0,0 +1,38 @@
+import pytest
+import commands
+import state
+import structures
+
+STATUS = bytes.fromhex('3801fc80ff0200320001ff00000300ff83')
+
+
+def test_cached_device(socks):
+    sock, peer = socks
+    device = state.CachedDevice(sock)
+
+    # Not seeded yet, so always sent
+    assert device.brightness(0xff)
+    assert peer.recv(4096) == commands.brightness(0xff)
+
+    peer.sendall(STATUS)
+    assert len(device.refresh()) == len(device.status)
+    assert peer.recv(4096) == commands.sync()
+
+    assert not device.brightness(0xff)
+    assert not device.mode_change(commands.MODE_AUTO)
+    assert not device.color(structures.RGB(0xff, 0, 0))
+    assert device.speed(0x10)
+    assert not device.speed(0x10)
+    assert peer.recv(4096) == commands.speed(0x10)
+    assert device.skipped == 4
+
+    peer.sendall(STATUS)
+    assert device.refresh() == {'speed': (0x10, 0x80)}
+    peer.recv(4096)
+
+    # A garbled reply leaves the mirror invalid
+    peer.sendall(b'\x31')
+    with pytest.raises(ValueError):
+        device.refresh()
+    assert device.status is None
+    assert device.brightness(0xff)
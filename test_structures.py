@@ -11,3 +11,69 @@ def test_RGB():
     with pytest.raises(ValueError):
         # data not long enough
         structures.RGB(b'\x01').bytes
+
+
+def test_PixelBuffer():
+    buf = structures.PixelBuffer(4)
+    assert len(buf) == 4
+    assert buf.view == bytes(12)
+
+    buf[1] = structures.RGB(1, 2, 3)
+    buf[-1] = b'\x04\x05\x06'
+    assert buf[1] == b'\x01\x02\x03'
+    assert buf[3] == b'\x04\x05\x06'
+
+    # pixel views share memory with the buffer
+    buf[1][0] = 0x7f
+    assert buf.view[3] == 0x7f
+
+    # as do slices
+    part = buf[2:4]
+    assert len(part) == 2
+    part.fill(structures.RGB(9, 9, 9))
+    assert buf.view[6:12] == b'\x09' * 6
+
+    buf.fill(b'\x01\x01\x01', stop=2)
+    assert buf.view[0:6] == b'\x01' * 6
+
+    buf.blit(structures.PixelBuffer(data=b'\x0a\x0b\x0c'), 3)
+    assert buf[3] == b'\x0a\x0b\x0c'
+    assert str(buf[3:]) == 'PixelBuffer(0a0b0c)'
+
+    with pytest.raises(IndexError):
+        buf[4]
+    with pytest.raises(ValueError):
+        buf[::2]
+    with pytest.raises(ValueError):
+        structures.PixelBuffer(data=bytearray(4))
+
+
+def test_DeviceStatus():
+    # Sniffed from the app, see notes.txt
+    status = structures.DeviceStatus.from_bytes(bytes.fromhex(
+        '3801fc80ff0200320001ff00000300ff83'
+    ))
+    assert status.lamp == 1
+    assert status.mode == 0xfc
+    assert status.speed == 0x80
+    assert status.brightness == 0xff
+    assert status.rgb_order == 2
+    assert status.dotperseg == 0x32
+    assert status.segs == 1
+    assert status.color == b'\xff\x00\x00'
+    assert str(status.staticcolor) == 'RGB(255, 0, 0)'
+    assert status.ic_model == 3
+    assert status.to_bytes().hex() == '3801fc80ff0200320001ff00000300ff83'
+
+    other = status._replace(brightness=0x10, dotperseg=0x40)
+    assert other.diff(status) == {
+        'brightness': (0xff, 0x10),
+        'dotperseg': (0x32, 0x40),
+    }
+    assert status.diff(status) == {}
+    assert len(status.diff(None)) == len(status)
+
+    with pytest.raises(ValueError):
+        structures.DeviceStatus.from_bytes(bytes(16))
+    with pytest.raises(ValueError):
+        structures.DeviceStatus.from_bytes(bytes(17))
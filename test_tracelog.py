@@ -0,0 +1,67 @@
+import io
+import os
+
+import pytest
+import connection
+import tracelog
+
+
+def test_hexdump():
+    assert tracelog.hexdump(b'abc\x00') == \
+        'H: 000: 61 62 63 00                                     |abc.|\n'
+    assert tracelog.hexdump(bytes(range(0x30, 0x41))) == (
+        'H: 000: 30 31 32 33 34 35 36 37 38 39 3a 3b 3c 3d 3e 3f |'
+        '0123456789:;<=>?|\n'
+        'H: 010: 40                                              |@|\n'
+    )
+    assert tracelog.hexdump(b'') == ''
+
+
+def test_print_sink():
+    out = io.StringIO()
+    tracelog.PrintSink(out).write(0, tracelog.TX, b'\x38\x83')
+    assert out.getvalue() == '> 3883\n'
+
+
+def test_trace_log(tmp_path):
+    path = str(tmp_path / 'trace.bin')
+    log = tracelog.TraceLog(path)
+    log.write(1.5, tracelog.TX, b'\x38\x00\x00\x00\x10\x83')
+    log.write(2.5, tracelog.RX, b'\x31')
+    log.close()
+
+    records = list(tracelog.read_trace(path))
+    assert records == [
+        (1.5, tracelog.TX, b'\x38\x00\x00\x00\x10\x83'),
+        (2.5, tracelog.RX, b'\x31'),
+    ]
+    assert tracelog.format_record(*records[1]) == '2.500000 < 31\n'
+
+    with pytest.raises(ValueError):
+        list(tracelog.read_trace(__file__))
+
+
+def test_rotate(tmp_path):
+    path = str(tmp_path / 'trace.bin')
+    log = tracelog.TraceLog(path, max_bytes=100, backups=2)
+    for i in range(20):
+        log.write(i, tracelog.TX, bytes(20))
+    log.close()
+
+    assert sorted(os.listdir(str(tmp_path))) == \
+        ['trace.bin', 'trace.bin.1', 'trace.bin.2']
+    assert [r[0] for r in tracelog.read_trace(path + '.1')] == [15, 16, 17]
+    assert [r[0] for r in tracelog.read_trace(path)] == [18, 19]
+
+
+def test_emit(socks):
+    out = io.StringIO()
+    tracelog.sinks.append(tracelog.PrintSink(out))
+    sock, peer = socks
+    try:
+        connection.txn(sock, b'\x01')
+        peer.sendall(b'\x31')
+        connection.rxn(sock)
+    finally:
+        tracelog.sinks.clear()
+    assert out.getvalue() == '> 01\n< 31\n'
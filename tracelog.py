@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+#
+# Tracing of the bytes sent to and received from controllers, either as
+# printed hex or as a compact binary log that can be decoded later with
+# this script
+
+import argparse
+import os
+import struct
+import sys
+import time
+
+TX = 0x3e   # '>'
+RX = 0x3c   # '<'
+
+MAGIC = b'SP108TR1'
+_record = struct.Struct('<dBI')     # time, direction, length
+
+# Every byte that hexdump shows as itself, with everything else as '.'
+_printable = bytes(
+    b if 0x20 <= b <= 0x7e else 0x2e
+    for b in range(256)
+)
+
+# Everything that is currently tracing, see emit()
+sinks = []
+
+
+def hexdump(buf):
+    """Takes bytes and does a standard hexdump"""
+    buf = bytes(buf)
+    lines = []
+    for addr in range(0, len(buf), 16):
+        chunk = buf[addr:addr+16]
+        lines.append("H: {:03x}: {:48}|{}|\n".format(
+            addr,
+            chunk.hex(' '),
+            chunk.translate(_printable).decode('ascii'),
+        ))
+    return ''.join(lines)
+
+
+def emit(direction, data):
+    """Pass the data to every sink
+
+    Callers check that sinks is not empty first, so that tracing costs
+    nothing when it is off.
+    """
+    now = time.time()
+    for sink in sinks:
+        sink.write(now, direction, data)
+
+
+class PrintSink(object):
+    """Print each packet as a line of hex"""
+
+    def __init__(self, f=sys.stdout):
+        self.f = f
+
+    def write(self, timestamp, direction, data):
+        self.f.write("{} {}\n".format(chr(direction), data.hex()))
+
+    def close(self):
+        pass
+
+
+class TraceLog(object):
+    """Append packets to a binary log file, rotating it when it is full
+
+    Writes are buffered, so call flush() or close() to be sure everything
+    is on disk.  Once the file is over max_bytes it is renamed with a .1
+    suffix, older logs move up by one and only backups of them are kept.
+    """
+
+    def __init__(self, path, max_bytes=64 << 20, backups=3,
+                 buffering=1 << 16):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffering = buffering
+        self.f = None
+        self._open()
+
+    def _open(self):
+        self.f = open(self.path, 'ab', buffering=self.buffering)
+        if self.f.tell() == 0:
+            self.f.write(MAGIC)
+
+    def _rotate(self):
+        self.f.close()
+        for i in range(self.backups - 1, 0, -1):
+            older = "{}.{}".format(self.path, i)
+            if os.path.exists(older):
+                os.replace(older, "{}.{}".format(self.path, i + 1))
+        if self.backups:
+            os.replace(self.path, self.path + '.1')
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def write(self, timestamp, direction, data):
+        self.f.write(_record.pack(timestamp, direction, len(data)))
+        self.f.write(data)
+        if self.f.tell() >= self.max_bytes:
+            self._rotate()
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+def read_trace(path):
+    """Generate (timestamp, direction, data) from a binary log file"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not a trace log'.format(path))
+        while True:
+            header = f.read(_record.size)
+            if len(header) < _record.size:
+                return
+            timestamp, direction, length = _record.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield timestamp, direction, data
+
+
+def format_record(timestamp, direction, data, dump=False):
+    """Return a printable form of one logged packet"""
+    line = "{:.6f} {} {}\n".format(timestamp, chr(direction), data.hex())
+    if dump:
+        line += hexdump(data)
+    return line
+
+
+def do_options():
+    a = argparse.ArgumentParser('Decode SP108E binary trace logs')
+    a.add_argument('-d', '--dump', action='store_true', default=False,
+                   help='Show a hexdump of each packet')
+    a.add_argument('files', nargs='+')
+    return a.parse_args()
+
+
+def main(args):
+    out = sys.stdout
+    for path in args.files:
+        for record in read_trace(path):
+            out.write(format_record(*record, dump=args.dump))
+
+
+if __name__ == '__main__':
+    args = do_options()
+    main(args)